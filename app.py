@@ -1,52 +1,237 @@
 #app.py
-from flask import Flask, request, jsonify, render_template
-from openai import OpenAI
-import sounddevice as sd
-import soundfile as sf
+import time
+APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 import numpy as np
 import threading
 import queue
-import time
 import os
-from weather_service import WeatherService
-from transformers import pipeline
-from gtts import gTTS
-from playsound import playsound
+import io
+import tempfile
 import webbrowser
-from music_service import YouTubeHelper
-from doc_writer import DocumentHandler
-from code_service import CodeHandler
-from code_explainer import CodeVisionService
-import os
-from data_science_helper import DataAnalysisService
+import pathlib
+import uuid
+import zlib
 from werkzeug.utils import secure_filename
-import pandas as pd
+from service_registry import ServiceRegistry
+from history_store import HistoryStore
+from event_bus import EventBus
+from conversation_pipeline import ConversationPipeline
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+from streaming_response import SentenceChunker
+from audio_buffer import AudioRingBuffer
+from audio_playback import AudioPlayer
+from transcription_service import PartialTranscriber
+from voice_activity import VoiceActivityDetector, UtteranceEndpointer
 
 app = Flask(__name__)
-client = os.getenv('OPENAI_API_KEY')
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')  
-weather_service = WeatherService()
-youtube_helper = YouTubeHelper()
-document_handler = DocumentHandler(client) 
-code_handler=CodeHandler(client)
-code_vision_service = CodeVisionService(GOOGLE_API_KEY)
-data_analysis_service = DataAnalysisService(GOOGLE_API_KEY)
 UPLOAD_FOLDER = 'uploads'
+EMOTION_BACKEND = os.getenv('EMOTION_BACKEND', 'pytorch')
+EMOTION_THREADS = int(os.getenv('EMOTION_THREADS', 0)) or None
+EMOTION_MAX_BATCH_SIZE = 16
+EMOTION_MAX_WAIT_MS = 10
+EMOTION_TIMEOUT = 30
+HISTORY_CAPACITY = 500
+# 'openai' (Whisper API), 'local' (faster-whisper on CPU, works offline) or 'stub'
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'openai').lower()
+LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'base.en')
+TRANSCRIPTION_PARTIALS = os.getenv('TRANSCRIPTION_PARTIALS', '1') != '0'
+PARTIAL_INTERVAL = 1.0
+PIPELINE_QUEUE_SIZE = 2
+CHAT_MODEL = "gpt-3.5-turbo"
+# 'fake' answers every OpenAI/Gemini call with canned text, for offline runs
+# (speech is then transcribed by the stub backend, since the fake has no audio API)
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai').lower()
+# Identical LLM requests are answered from a memory + SQLite response cache
+LLM_CACHE = os.getenv('LLM_CACHE', '1') != '0'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('cache', 'llm.sqlite3'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 60 * 60))
+# Conversational replies aren't cached by default ("tell me a joke" should vary);
+# with LLM_CACHE_CHAT=1 they are kept in memory for LLM_CHAT_CACHE_TTL seconds.
+# Code and document generation always use the long-lived cache above.
+LLM_CACHE_CHAT = os.getenv('LLM_CACHE_CHAT', '0') == '1'
+LLM_CHAT_CACHE_TTL = float(os.getenv('LLM_CHAT_CACHE_TTL', 5 * 60))
+# Per-provider limits applied by the LLM dispatcher; unset RPM/TPM means unlimited
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 4))
+OPENAI_RPM = float(os.getenv('OPENAI_RPM', 0)) or None
+OPENAI_TPM = float(os.getenv('OPENAI_TPM', 0)) or None
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 2))
+GEMINI_RPM = float(os.getenv('GEMINI_RPM', 0)) or None
+GEMINI_TPM = float(os.getenv('GEMINI_TPM', 0)) or None
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+# Speak LLM replies sentence by sentence as they stream in
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', '1') != '0'
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+# 'keywords' routes commands by trigger phrases; 'embedding' adds a local sentence
+# embedding classifier, falling back to the keywords below INTENT_CONFIDENCE
+INTENT_CLASSIFIER = os.getenv('INTENT_CLASSIFIER', 'keywords').lower()
+INTENT_EMBEDDING_MODEL = os.getenv('INTENT_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+INTENT_CONFIDENCE = float(os.getenv('INTENT_CONFIDENCE', 0.55))
+# Folders (separated by os.pathsep) searched for a song before YouTube
+MUSIC_LIBRARY_DIRS = [d for d in os.getenv('MUSIC_LIBRARY_DIRS', '').split(os.pathsep) if d]
+# 'youtube' scrapes YouTube search; 'fake' returns canned results for offline runs
+MUSIC_SEARCH_PROVIDER = os.getenv('MUSIC_SEARCH_PROVIDER', 'youtube').lower()
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'gtts').lower()
+TTS_VOICE = os.getenv('TTS_VOICE')
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', 'tts_cache')
+TTS_CACHE_MAX_MB = float(os.getenv('TTS_CACHE_MAX_MB', 50))
+ERROR_SPEECH = "I encountered an error processing your request. Please try again."
+DOCUMENT_SPEECH = "I've processed your document request."
+# Fixed phrases synthesized in the background when the TTS service is built
+TTS_WARM_PHRASES = [ERROR_SPEECH, DOCUMENT_SPEECH]
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-emotion_classifier = pipeline(
-    "text-classification",
-    model="j-hartmann/emotion-english-distilroberta-base",
-    return_all_scores=True
-)
+# Heavy clients, models and libraries are only imported/built on first use so
+# routes that don't need them (e.g. /code_explainer) start in milliseconds.
+services = ServiceRegistry()
+
+# Exported at /metrics (Prometheus text) and /metrics_summary (rolling percentiles)
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram('stage_seconds', 'Conversation stage latency (record_wait, record, transcribe, emotion, route, llm, tts, ...)')
+stage_errors = metrics.counter('stage_errors', 'Conversation stage failures')
+turn_seconds = metrics.histogram('turn_seconds', 'Turn latency from speech onset until its speech is queued')
+llm_first_token_seconds = metrics.histogram('llm_first_token_seconds', 'Time to the first streamed token of a chat reply')
+http_request_seconds = metrics.histogram('http_request_seconds', 'Flask request latency per route')
+
+def _create_openai_client():
+    if LLM_PROVIDER == 'fake':
+        from llm_client import FakeLLMProvider
+        return FakeLLMProvider()
+    from openai import OpenAI
+    # Retries are handled by the LLM dispatcher
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+def _create_llm():
+    from llm_client import LLMClient, LLMResponseCache
+    from llm_dispatch import LLMDispatcher, ProviderLimits
+    dispatcher = LLMDispatcher({
+        'openai': ProviderLimits(OPENAI_MAX_CONCURRENCY, OPENAI_RPM, OPENAI_TPM, LLM_TIMEOUT, LLM_MAX_RETRIES),
+        'gemini': ProviderLimits(GEMINI_MAX_CONCURRENCY, GEMINI_RPM, GEMINI_TPM, LLM_TIMEOUT, LLM_MAX_RETRIES)
+    }, metrics=metrics)
+    cache = LLMResponseCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL) if LLM_CACHE else None
+    return LLMClient(cache=cache, openai_factory=lambda: services.get('openai_client'), dispatcher=dispatcher)
+
+def _fake_gemini_model():
+    if LLM_PROVIDER != 'fake':
+        return None
+    from llm_client import FakeLLMProvider
+    return FakeLLMProvider(model_name='fake-gemini')
+
+def _create_http_client():
+    from http_client import get_shared_client
+    return get_shared_client()
+
+def _create_weather_service():
+    from weather_service import WeatherService
+    return WeatherService(http_client=services.get('http_client'))
+
+def _create_youtube_helper():
+    from music_service import FakeSearchProvider, YouTubeHelper
+    if MUSIC_SEARCH_PROVIDER == 'fake':
+        return YouTubeHelper(provider=FakeSearchProvider(), open_browser=False)
+    return YouTubeHelper()
+
+def _create_music_library():
+    from music_library import MusicLibrary
+    if not MUSIC_LIBRARY_DIRS:
+        return None
+    library = MusicLibrary(MUSIC_LIBRARY_DIRS)
+    # Queries are answered from the saved index while the folders are rescanned
+    threading.Thread(target=library.rescan, name="music-library-scan", daemon=True).start()
+    return library
+
+def _create_document_handler():
+    from doc_writer import DocumentHandler
+    return DocumentHandler(services.get('openai_client'), llm=services.get('llm'))
+
+def _create_code_handler():
+    from code_service import CodeHandler
+    return CodeHandler(services.get('openai_client'), llm=services.get('llm'))
+
+def _create_code_vision_service():
+    from code_explainer import CodeVisionService
+    return CodeVisionService(GOOGLE_API_KEY, llm=services.get('llm'), model=_fake_gemini_model())
+
+def _create_data_analysis_service():
+    from data_science_helper import DataAnalysisService
+    return DataAnalysisService(GOOGLE_API_KEY, llm=services.get('llm'), model=_fake_gemini_model())
+
+def _create_emotion_classifier():
+    from emotion_service import create_emotion_backend
+    return create_emotion_backend(EMOTION_BACKEND, EMOTION_THREADS)
+
+def _create_emotion_engine():
+    from emotion_service import BatchInferenceEngine
+    return BatchInferenceEngine(
+        lambda texts: services.get('emotion_classifier').classify(texts),
+        max_batch_size=EMOTION_MAX_BATCH_SIZE,
+        max_wait_ms=EMOTION_MAX_WAIT_MS
+    )
+
+def _create_transcriber():
+    from transcription_service import create_transcription_backend
+    if TRANSCRIPTION_BACKEND == 'openai':
+        if LLM_PROVIDER == 'fake':
+            # The fake provider has no audio API; stay offline with the stub transcriber
+            print("LLM_PROVIDER=fake: using the stub transcription backend")
+            return create_transcription_backend('stub')
+        return create_transcription_backend('openai', client=services.get('openai_client'))
+    if TRANSCRIPTION_BACKEND == 'local':
+        return create_transcription_backend('local', model_size=LOCAL_WHISPER_MODEL)
+    return create_transcription_backend(TRANSCRIPTION_BACKEND)
+
+def _create_intent_router():
+    from intent_router import IntentRouter, default_rules
+    router = IntentRouter(default_rules())
+    if INTENT_CLASSIFIER != 'embedding':
+        return router
+
+    from intent_classifier import EmbeddingIntentClassifier, HybridIntentRouter, TransformerSentenceEncoder
+    try:
+        classifier = EmbeddingIntentClassifier(TransformerSentenceEncoder(INTENT_EMBEDDING_MODEL))
+    except Exception as e:
+        print(f"Intent classifier unavailable, using keyword routing: {str(e)}")
+        return router
+    return HybridIntentRouter(router, classifier, threshold=INTENT_CONFIDENCE)
+
+def _create_tts():
+    from tts_service import TextToSpeechService, TTSCache, create_tts_backend
+    if TTS_BACKEND == 'local':
+        backend = create_tts_backend('local', voice=TTS_VOICE)
+    else:
+        backend = create_tts_backend(TTS_BACKEND)
+    tts = TextToSpeechService(backend, TTSCache(TTS_CACHE_DIR, int(TTS_CACHE_MAX_MB * 1024 * 1024)))
+    threading.Thread(target=tts.warm, args=(TTS_WARM_PHRASES,), name="tts-warm", daemon=True).start()
+    return tts
+
+services.register('openai_client', _create_openai_client)
+services.register('llm', _create_llm)
+services.register('http_client', _create_http_client)
+services.register('weather_service', _create_weather_service)
+services.register('youtube_helper', _create_youtube_helper)
+services.register('music_library', _create_music_library)
+services.register('document_handler', _create_document_handler)
+services.register('code_handler', _create_code_handler)
+services.register('code_vision_service', _create_code_vision_service)
+services.register('data_analysis_service', _create_data_analysis_service)
+services.register('emotion_classifier', _create_emotion_classifier)
+services.register('transcriber', _create_transcriber)
+services.register('emotion_engine', _create_emotion_engine)
+services.register('tts', _create_tts)
+services.register('intent_router', _create_intent_router)
 
 class EmotionDetector:
     def __init__(self):
-        self.emotions_history = []
+        self.emotions_history = HistoryStore(HISTORY_CAPACITY, label_key='dominant_emotion', id_key='id')
         
-    def detect_emotion(self, text):
+    def detect_emotion(self, text, session_id='default'):
         try:
-            emotions = emotion_classifier(text)[0]
+            emotions = services.get('emotion_engine').infer(text, timeout=EMOTION_TIMEOUT)
             emotions.sort(key=lambda x: x['score'], reverse=True)
             dominant_emotion = emotions[0]['label']
             
@@ -55,15 +240,15 @@ class EmotionDetector:
                 'dominant_emotion': dominant_emotion,
                 'all_emotions': emotions,
                 'timestamp': time.strftime("%H:%M:%S")
-            })
+            }, session_id)
             
             return dominant_emotion, emotions
         except Exception as e:
             print(f"Error detecting emotion: {str(e)}")
             return "neutral", []
     
-    def get_emotion_history(self):
-        return self.emotions_history
+    def get_emotion_history(self, **filters):
+        return self.emotions_history.query(**filters)
 
 emotion_detector = EmotionDetector()
 
@@ -71,27 +256,58 @@ audio_queue = queue.Queue()
 SAMPLE_RATE = 16000
 CHANNELS = 1
 CHUNK_SIZE = 1024
-conversation_history = []
+event_bus = EventBus()
+active_pipelines = {}
+conversation_history = HistoryStore(HISTORY_CAPACITY, label_key='emotion', id_key='id')
 SILENCE_THRESHOLD = 0.01
-SILENCE_DURATION = 5
+# Trailing silence (seconds) that ends an utterance
+SILENCE_DURATION = float(os.getenv('SILENCE_DURATION', 1.0))
 CHUNK_DURATION = 0.1  
 CHUNK_SIZE = int(SAMPLE_RATE * CHUNK_DURATION)
+MAX_RECORDING_SECONDS = float(os.getenv('MAX_RECORDING_SECONDS', 30))
+PRE_ROLL_SECONDS = 0.3
+# By default the microphone is ignored while replies are spoken, so the
+# assistant can't hear (and answer) its own voice through the speakers. With
+# BARGE_IN=1, speech during playback that is BARGE_IN_THRESHOLD_FACTOR times
+# louder than the normal speech threshold and lasts BARGE_IN_SECONDS stops
+# playback and starts the next turn.
+BARGE_IN = os.getenv('BARGE_IN', '0') == '1'
+BARGE_IN_SECONDS = 0.3
+BARGE_IN_THRESHOLD_FACTOR = float(os.getenv('BARGE_IN_THRESHOLD_FACTOR', 3.0))
+# Write recordings and synthesized speech to temp files instead of keeping them in memory
+AUDIO_SPOOL_TO_DISK = os.getenv('AUDIO_SPOOL_TO_DISK', '0') == '1'
+audio_player = AudioPlayer(spool_to_disk=AUDIO_SPOOL_TO_DISK)
 
 class AudioRecorder:
     def __init__(self):
         self.recording_active = False
         self.last_voice_activity = 0
-        self.audio_buffer = []
+        self.audio_buffer = AudioRingBuffer(
+            SAMPLE_RATE, CHANNELS,
+            max_seconds=MAX_RECORDING_SECONDS,
+            pre_roll_seconds=PRE_ROLL_SECONDS
+        )
+        self.vad = VoiceActivityDetector(SAMPLE_RATE, min_threshold=SILENCE_THRESHOLD)
+        self.endpointer = UtteranceEndpointer(
+            SAMPLE_RATE,
+            trailing_silence=SILENCE_DURATION,
+            max_utterance=MAX_RECORDING_SECONDS
+        )
+        self.last_turn = None
+        self.barge_in_samples = 0
         
     def reset(self):
         self.recording_active = False
         self.last_voice_activity = 0
-        self.audio_buffer = []
+        self.audio_buffer.reset()
+        self.vad.reset()
+        self.endpointer.start()
 
 audio_recorder = AudioRecorder()
 
 def list_audio_devices():
     """List all available audio input devices"""
+    import sounddevice as sd
     devices = sd.query_devices()
     input_devices = []
     for i, device in enumerate(devices):
@@ -103,32 +319,65 @@ def list_audio_devices():
             })
     return input_devices
 
-def detect_voice_activity(audio_data):
-    """Detect if there is voice activity in the audio data"""
-    chunks = np.array_split(audio_data, max(1, len(audio_data) // CHUNK_SIZE))
-    rms_values = [np.sqrt(np.mean(chunk**2)) for chunk in chunks]
-    return max(rms_values) > SILENCE_THRESHOLD
-
 def audio_callback(indata, frames, time_info, status):
     """Callback for audio stream"""
     """Callback function for audio stream"""
     if status:
         print('Audio callback status:', status)
     
+    playing = audio_player.is_playing
+    if playing and not BARGE_IN:
+        return
+    
     if indata.shape[1] > 1:
         indata = np.mean(indata, axis=1, keepdims=True)
 
-    if detect_voice_activity(indata):
+    if audio_recorder.endpointer.done.is_set():
+        return
+
+    is_speech = audio_recorder.vad.process(indata)
+    if playing and is_speech:
+        # Echo of the reply reaches the VAD too; only clearly louder speech counts
+        rms = float(np.sqrt(np.mean(np.square(indata))))
+        is_speech = rms >= audio_recorder.vad.threshold * BARGE_IN_THRESHOLD_FACTOR
+    if playing and is_speech:
+        audio_recorder.barge_in_samples += len(indata)
+        # Only flags the interrupt; the playback thread does the locking work
+        if audio_recorder.barge_in_samples >= BARGE_IN_SECONDS * SAMPLE_RATE and audio_player.request_interrupt():
+            audio_recorder.barge_in_samples = 0
+            print("Barge-in detected - playback stopped")
+    else:
+        audio_recorder.barge_in_samples = 0
+
+    if is_speech:
         audio_recorder.last_voice_activity = time.time()
         if not audio_recorder.recording_active:
             audio_recorder.recording_active = True
+            audio_recorder.audio_buffer.start()
+            audio_recorder.endpointer.start()
             print("Voice detected - recording started")
     
     if audio_recorder.recording_active:
-        audio_recorder.audio_buffer.append(indata.copy())
+        audio_recorder.audio_buffer.append(indata)
+        reason = audio_recorder.endpointer.update(is_speech, len(indata), audio_recorder.audio_buffer.full)
+        if reason:
+            # Either the utterance ended (record_audio is woken through the
+            # endpointer's event) or it was too short to keep.
+            audio_recorder.recording_active = False
+    else:
+        audio_recorder.audio_buffer.write_pre_roll(indata)
 
-def record_audio(device_id=None):
-    """Record audio with improved quality and silence detection"""
+def record_audio(device_id=None, on_partial=None):
+    """
+    Record one utterance. Recording starts when voice is detected and ends when
+    the audio callback signals an endpoint (trailing silence or max length);
+    trailing silence is trimmed before the audio is encoded.
+
+    With a local transcription backend, on_partial receives partial transcripts
+    while the user is still talking, and the raw samples are returned without
+    WAV encoding.
+    """
+    import sounddevice as sd
     print(f"🎤 Recording using device {device_id}...")
     audio_recorder.reset()
     
@@ -147,67 +396,105 @@ def record_audio(device_id=None):
             callback=audio_callback,
             blocksize=CHUNK_SIZE
         ):
-            audio_recorder.recording_active = True
-            audio_recorder.last_voice_activity = time.time()
-            while True:
-                time.sleep(0.1) 
-                
-                current_time = time.time()
-                if (current_time - audio_recorder.last_voice_activity > SILENCE_DURATION and 
-                    audio_recorder.recording_active):
-                    audio_recorder.recording_active = False
-                    print("Silence detected - stopping recording")
-                    break
+            partials = start_partial_transcription(on_partial)
+            try:
+                audio_recorder.endpointer.wait()
+            finally:
+                if partials:
+                    partials.stop()
         
-        if not audio_recorder.audio_buffer:
+        endpointer = audio_recorder.endpointer
+        recorded = len(audio_recorder.audio_buffer)
+        if not recorded:
             raise ValueError("No audio data recorded")
+        if endpointer.reason == 'max_length':
+            print(f"Reached {MAX_RECORDING_SECONDS}s limit - stopping recording")
+        else:
+            print("Silence detected - stopping recording")
         
-        audio_data = np.concatenate(audio_recorder.audio_buffer, axis=0)
-        temp_filename = f"temp_{int(time.time())}.wav"
-        sf.write(temp_filename, audio_data, SAMPLE_RATE)
-        
-        return temp_filename
+        audio_data = audio_recorder.audio_buffer.view()[:recorded - endpointer.trim_samples()]
+        if services.get('transcriber').accepts_arrays and not AUDIO_SPOOL_TO_DISK:
+            # The buffer is reused for the next utterance, so hand out a copy
+            audio = audio_data.reshape(-1).copy()
+        else:
+            audio = encode_wav(audio_data)
+
+        metrics = endpointer.turn_metrics(recorded)
+        metrics['finalize_ms'] = round((time.perf_counter() - endpointer.ended_at) * 1000, 1)
+        audio_recorder.last_turn = metrics
+        print(f"Endpoint: {metrics}")
+        return audio
     
     except Exception as e:
         print(f"Error recording audio: {str(e)}")
         raise
 
-def transcribe_audio(file_path):
-    """Transcribe audio file using OpenAI Whisper"""
+def encode_wav(audio_data):
+    """
+    Encode recorded samples as WAV in memory, or in a uniquely named temp file
+    when AUDIO_SPOOL_TO_DISK is set. Returns a BytesIO or a file path.
+    """
+    import soundfile as sf
+    if AUDIO_SPOOL_TO_DISK:
+        fd, path = tempfile.mkstemp(prefix='recording_', suffix='.wav')
+        os.close(fd)
+        sf.write(path, audio_data, SAMPLE_RATE)
+        return path
+
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_data, SAMPLE_RATE, format='WAV')
+    buffer.seek(0)
+    buffer.name = 'speech.wav'
+    return buffer
+
+def start_partial_transcription(on_partial):
+    """Start streaming partial transcripts from the recorder's buffer, if the backend supports it"""
+    transcriber = services.get('transcriber')
+    if on_partial is None or not TRANSCRIPTION_PARTIALS or not transcriber.supports_partials:
+        return None
+
+    def snapshot():
+        if not audio_recorder.recording_active:
+            return np.zeros(0, dtype=np.float32)
+        return audio_recorder.audio_buffer.view().reshape(-1).copy()
+
+    partials = PartialTranscriber(transcriber, snapshot, SAMPLE_RATE, on_partial, interval=PARTIAL_INTERVAL)
+    partials.start()
+    return partials
+
+def release_audio(audio):
+    """Delete a spooled recording; in-memory buffers need no cleanup"""
+    if isinstance(audio, str) and os.path.exists(audio):
+        os.remove(audio)
+
+def transcribe_audio(audio):
+    """Transcribe recorded samples, an in-memory WAV buffer or an audio file path"""
     print("📝 Transcribing audio...")
     try:
-        with open(file_path, 'rb') as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-        return transcript.text
+        return services.get('transcriber').transcribe(audio, SAMPLE_RATE)
     except Exception as e:
         print(f"Error transcribing audio: {str(e)}")
         raise
-DOCUMENT_KEYWORDS = {
-    'create': ['type', 'write', 'create', 'make', 'generate', 'compose'],
-    'edit': ['edit', 'modify', 'change', 'update', 'revise'],
-    'read': ['read', 'show', 'display', 'open', 'view']
-}
-
-def handle_document_command(text):
+def handle_document_command(text, action, filename=None):
     """
     Handle document-related commands with improved parsing and response generation.
     This function centralizes all document operations for better maintenance and reliability.
+
+    Args:
+        text: The user's request
+        action: 'create', 'edit' or 'read', as routed by the intent router
+        filename: File named in a read request, if any
     """
-    text_lower = text.lower()
+    document_handler = services.get('document_handler')
     
-    command_type = None
-    
-    if any(keyword in text_lower for keyword in DOCUMENT_KEYWORDS['create']):
+    if action == 'create':
         doc_type, filename, content, generate_content = document_handler.parse_document_command(text)
         if doc_type == 'word':
             return document_handler.create_word_document(content, filename, generate_content)
         else:
             return document_handler.create_text_file(content, filename, generate_content)
     
-    elif any(keyword in text_lower for keyword in DOCUMENT_KEYWORDS['edit']):
+    elif action == 'edit':
         filepath, edit_instructions = document_handler.parse_edit_command(text)
         if filepath and edit_instructions:
             result = document_handler.edit_document(filepath, edit_instructions)
@@ -215,68 +502,89 @@ def handle_document_command(text):
                 return f"I've updated the document '{filepath}' with your requested changes. The edits have been saved."
             return result
     
-    elif any(keyword in text_lower for keyword in DOCUMENT_KEYWORDS['read']):
-        words = text.split()
-        for word in words:
-            if word.endswith('.txt') or word.endswith('.docx'):
-                content = document_handler.read_document(word)
-                if content:
-                    return f"Here's the content of {word}:\n\n{content}"
-                else:
-                    return f"I couldn't find or read the file named {word}. Please make sure it exists and try again."
+    elif action == 'read':
+        if filename:
+            content = document_handler.read_document(filename)
+            if content:
+                return f"Here's the content of {filename}:\n\n{content}"
+            else:
+                return f"I couldn't find or read the file named {filename}. Please make sure it exists and try again."
         return "Please specify which file you'd like me to read."
     
     return None
 
 
-def get_chatgpt_response(text, emotion):
+def handle_code_generate(intent):
+    result = services.get('code_handler').generate_program(intent.slots["request"])
+    if result["status"] == "success":
+        return f"I've created your program and saved it as {result['filename']}"
+    return f"Sorry, there was an error: {result['message']}"
+
+def handle_code_edit(intent):
+    file_path = intent.slots["file_path"]
+    if not file_path:
+        return "Please specify which file you'd like me to edit."
+    result = services.get('code_handler').edit_code(file_path, intent.slots["request"])
+    if result["status"] == "success":
+        return f"I've updated the code in {file_path}"
+    return f"Sorry, there was an error: {result['message']}"
+
+def handle_music(intent):
+    query = intent.slots['query']
+    if not query:
+        return "What song would you like me to search for?"
+    library = services.get('music_library')
+    track = library.best_match(query) if library else None
+    if track:
+        webbrowser.open(pathlib.Path(track['path']).as_uri())
+        artist = f" by {track['artist']}" if track.get('artist') else ""
+        return f"Playing {track['title']}{artist} from your music library."
+    return services.get('youtube_helper').search_and_play(query)
+
+def handle_document(intent):
+    action = intent.name.split('_', 1)[1]
+    return handle_document_command(intent.text, action, intent.slots.get('filename'))
+
+def handle_weather(intent):
+    weather_service = services.get('weather_service')
+    cities, days = weather_service.parse_weather_request(intent.text)
+    if not cities:
+        return None
+    if len(cities) == 1 and len(days) == 1:
+        weather_data = weather_service.get_weather(cities[0], days[0])
+        return weather_service.format_weather_response(weather_data, cities[0], days[0])
+    return weather_service.format_weather_report(weather_service.get_weather_report(cities, days))
+
+INTENT_HANDLERS = {
+    'code_generate': handle_code_generate,
+    'code_edit': handle_code_edit,
+    'music': handle_music,
+    'document_create': handle_document,
+    'document_edit': handle_document,
+    'document_read': handle_document,
+    'weather': handle_weather
+}
+
+
+def handle_command(text):
     """
-    Enhanced get_chatgpt_response function with improved document handling integration.
-    Now includes better context awareness and more natural responses.
+    Route the text through the intent router and run the matching handler.
+    Returns the handler's reply, or None if the text should go to the LLM.
     """
-    print("🤖 Getting AI response...")
-    
-    text_lower = text.lower()
-    code_request = code_handler.parse_code_request(text)
-    if code_request:
-        if code_request["type"] == "generate":
-            result = code_handler.generate_program(code_request["request"])
-            if result["status"] == "success":
-                return f"I've created your program and saved it as {result['filename']}"
-            else:
-                return f"Sorry, there was an error: {result['message']}"
-        elif code_request["type"] == "edit":
-            if code_request["file_path"]:
-                result = code_handler.edit_code(code_request["file_path"], code_request["request"])
-                if result["status"] == "success":
-                    return f"I've updated the code in {code_request['file_path']}"
-                else:
-                    return f"Sorry, there was an error: {result['message']}"
-            else:
-                return "Please specify which file you'd like me to edit."
-    
-    if (('play' in text_lower or 'find' in text_lower or 'search' in text_lower) and 
-        ('song' in text_lower or 'music' in text_lower or 'youtube' in text_lower)):
-        query = text_lower
-        for word in ['play', 'find', 'search', 'for', 'song', 'music', 'youtube', 'on', 'please', 'can', 'you']:
-            query = query.replace(word, '')
-        query = query.strip()
-        
-        if query:
-            return youtube_helper.search_and_play(query)
-        else:
-            return "What song would you like me to search for?"
-
-    doc_response = handle_document_command(text)
-    if doc_response:
-        return doc_response
+    tried_document = False
+    for intent in services.get('intent_router').route(text):
+        if intent.name.startswith('document_'):
+            # Only the highest-ranked document action is attempted
+            if tried_document:
+                continue
+            tried_document = True
+        response = INTENT_HANDLERS[intent.name](intent)
+        if response is not None:
+            return response
+    return None
 
-    if any(word in text_lower for word in ['weather', 'temperature', 'forecast']):
-        city, forecast_days = weather_service.parse_weather_query(text)
-        if city:
-            weather_data = weather_service.get_weather(city, forecast_days)
-            return weather_service.format_weather_response(weather_data, city, forecast_days)
 
+def build_chat_messages(text, emotion):
     system_message = f"""You are a helpful assistant responding to a user. Based on their detected emotional state of {emotion}, adjust your response style appropriately:
 
     joy: match their positive energy while staying focused
@@ -302,66 +610,221 @@ def get_chatgpt_response(text, emotion):
     
     Always be helpful and professional while being mindful of their emotional state."""
     
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": text}
-        ]
-    )
-    return response.choices[0].message.content
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": text}
+    ]
+
 
+def get_chatgpt_response(text, emotion):
+    """
+    Enhanced get_chatgpt_response function with improved document handling integration.
+    Now includes better context awareness and more natural responses.
+    """
+    print("🤖 Getting AI response...")
+    
+    with stage_seconds.time(stage='route'):
+        command_response = handle_command(text)
+    if command_response is not None:
+        return command_response
 
-def text_to_speech(text):
-    """Convert text to speech and play it"""
+    with stage_seconds.time(stage='llm'):
+        return services.get('llm').chat(
+            model=CHAT_MODEL,
+            messages=build_chat_messages(text, emotion),
+            bypass=not LLM_CACHE_CHAT,
+            cache_ttl=LLM_CHAT_CACHE_TTL
+        )
+
+
+def text_to_speech(text, group=None):
+    """
+    Convert text to speech (or fetch it from the TTS cache) and queue it for
+    playback without waiting for it to play.
+
+    Args:
+        text: Text to speak
+        group: Reply the clip belongs to; a barge-in drops the rest of the group
+
+    Returns:
+        The queued PlaybackItem, or None if synthesis failed or the reply was interrupted
+    """
+    if group is not None and audio_player.is_cancelled(group):
+        # Barge-in already cancelled this reply; don't synthesize the rest of it
+        return None
     try:
-        audio_file = f"response_{int(time.time())}.mp3"
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(audio_file)
-        playsound(audio_file)
-        os.remove(audio_file)
+        with stage_seconds.time(stage='tts'):
+            buffer, suffix = services.get('tts').synthesize(text)
+        return audio_player.enqueue(buffer, suffix, group=group)
     except Exception as e:
         print(f"Error in text to speech: {str(e)}")
+        return None
 
 
-def conversation_loop(device_id):
-    """Main conversation loop with improved document handling"""
-    while True:
-        try:
-            audio_file = record_audio(device_id=device_id)
-            
-            transcription = transcribe_audio(audio_file)
-            print(f"User said: {transcription}")
-            
-            dominant_emotion, emotion_scores = emotion_detector.detect_emotion(transcription)
-            print(f"Detected emotion: {dominant_emotion}")
-            response = get_chatgpt_response(transcription, dominant_emotion)
-            print(f"AI responds: {response}")
-
-            if len(response) > 300 and any(keyword in transcription.lower() for keyword in ['write', 'create', 'generate', 'edit']):
-                speech_text = "I've processed your document request. " + response.split('\n')[0]
-                text_to_speech(speech_text)
-            else:
-                text_to_speech(response)
-            
-            conversation_history.append({
-                "user": transcription,
-                "emotion": dominant_emotion,
-                "emotion_scores": emotion_scores,
-                "ai": response,
-                "timestamp": time.strftime("%H:%M:%S")
-            })
-            
-            os.remove(audio_file)
-            
-        except Exception as e:
-            error_msg = f"Error in conversation loop: {str(e)}"
-            print(error_msg)
-            text_to_speech("I encountered an error processing your request. Please try again.")
-            time.sleep(1)
+def transcribe_stage(turn):
+    try:
+        turn['transcription'] = transcribe_audio(turn['audio'])
+    finally:
+        release_audio(turn.pop('audio'))
+    print(f"User said: {turn['transcription']}")
+    event_bus.publish('transcription', {"sessionId": turn['session_id'], "text": turn['transcription']})
+    return turn
+
+def emotion_stage(turn):
+    dominant_emotion, emotion_scores = emotion_detector.detect_emotion(turn['transcription'], turn['session_id'])
+    print(f"Detected emotion: {dominant_emotion}")
+    event_bus.publish('emotion', {"sessionId": turn['session_id'], "emotion": dominant_emotion})
+    turn['emotion'] = dominant_emotion
+    turn['emotion_scores'] = emotion_scores
+    return turn
+
+def record_response(turn, response):
+    """Store and publish the finished reply for a turn"""
+    transcription = turn['transcription']
+    message = {
+        "user": transcription,
+        "emotion": turn['emotion'],
+        "emotion_scores": turn['emotion_scores'],
+        "ai": response,
+        "timestamp": time.strftime("%H:%M:%S")
+    }
+    conversation_history.append(message, turn['session_id'])
+    event_bus.publish('response', dict(message, sessionId=turn['session_id']))
+
+    if len(response) > 300 and any(keyword in transcription.lower() for keyword in ['write', 'create', 'generate', 'edit']):
+        # Spoken as two clips so the fixed prefix comes from the TTS cache
+        turn['speech_text'] = [DOCUMENT_SPEECH, response.split('\n')[0]]
+    else:
+        turn['speech_text'] = response
+    turn['message_id'] = message['id']
+    return turn
+
+def respond_stage(turn):
+    if STREAM_RESPONSES:
+        return stream_respond_stage(turn)
+    response = get_chatgpt_response(turn['transcription'], turn['emotion'])
+    print(f"AI responds: {response}")
+
+    # Record and publish the reply before speaking it so the chat updates
+    # while the audio is still being synthesized.
+    return record_response(turn, response)
+
+def stream_respond_stage(turn):
+    """
+    Stream the LLM reply and hand each sentence to the speak stage as soon as it
+    is complete, so audio starts after the first sentence instead of the whole reply.
+    """
+    print("🤖 Getting AI response...")
+    with stage_seconds.time(stage='route'):
+        command_response = handle_command(turn['transcription'])
+    if command_response is not None:
+        print(f"AI responds: {command_response}")
+        yield record_response(turn, command_response)
+        return
+
+    llm_started = time.perf_counter()
+    llm = services.get('llm')
+    messages = build_chat_messages(turn['transcription'], turn['emotion'])
+    cached = llm.cached_chat(CHAT_MODEL, messages) if LLM_CACHE_CHAT else None
+    if cached is not None:
+        # Already answered: split the cached reply the same way a stream would be
+        chunker = SentenceChunker()
+        stream = None
+        sentences = chunker.feed(cached) + chunker.flush()
+    else:
+        stream = llm.stream_chat(CHAT_MODEL, messages)
+        sentences = stream
+    for sentence in sentences:
+        event_bus.publish('response_delta', {"sessionId": turn['session_id'], "text": sentence})
+        yield {'session_id': turn['session_id'], 'turn_id': turn['turn_id'], 'speech_text': sentence}
+
+    # Includes time spent waiting on the speak stage while sentences were handed over
+    stage_seconds.observe(time.perf_counter() - llm_started, stage='llm')
+    text = cached if stream is None else stream.text
+    if stream is not None:
+        if LLM_CACHE_CHAT:
+            llm.store_chat(CHAT_MODEL, messages, text, cache_ttl=LLM_CHAT_CACHE_TTL)
+        if stream.first_token_seconds is not None:
+            llm_first_token_seconds.observe(stream.first_token_seconds, model=CHAT_MODEL)
+            print(f"First token after {stream.first_token_seconds:.2f}s")
+    print(f"AI responds: {text}")
+    final = record_response(turn, text)
+    final['speech_text'] = None
+    yield final
+
+def speak_stage(turn):
+    """Queue the turn's speech; tts_done is published once it has finished playing"""
+    speech = turn.get('speech_text')
+    for text in ([speech] if isinstance(speech, str) else speech or []):
+        if text:
+            text_to_speech(text, group=turn['turn_id'])
+    if 'message_id' in turn:
+        event = {"sessionId": turn['session_id'], "id": turn['message_id']}
+        audio_player.call_after(lambda: event_bus.publish('tts_done', event))
+    return turn
+
+def conversation_loop(device_id, session_id='default'):
+    """
+    Main conversation loop, run as a pipeline so the microphone keeps capturing
+    the next utterance while the previous one is transcribed, answered and spoken.
+    """
+    def on_partial(text):
+        event_bus.publish('partial_transcription', {"sessionId": session_id, "text": text})
+
+    def record_turn():
+        audio = record_audio(device_id=device_id, on_partial=on_partial)
+        return {'session_id': session_id, 'turn_id': uuid.uuid4().hex, 'audio': audio,
+                'speech_started': audio_recorder.endpointer.started_at}
+
+    def on_error(stage, turn, error):
+        event_bus.publish('error', {"sessionId": session_id, "stage": stage, "error": str(error)})
+        if stage != 'record':
+            text_to_speech(ERROR_SPEECH)
+
+    def observe_stage(stage, seconds, failed):
+        if stage == 'turn':
+            turn_seconds.observe(seconds)
+            return
+        stage_seconds.observe(seconds, stage=stage)
+        if failed:
+            stage_errors.inc(stage=stage)
+
+    pipeline = ConversationPipeline(
+        record_turn,
+        [
+            ('transcribe', transcribe_stage),
+            ('emotion', emotion_stage),
+            ('respond', respond_stage),
+            ('speak', speak_stage)
+        ],
+        queue_size=PIPELINE_QUEUE_SIZE,
+        on_error=on_error,
+        observer=observe_stage,
+        # Streamed replies pass several items per turn; the last one carries the message id
+        is_turn_end=lambda turn: turn is not None and 'message_id' in turn,
+        # Time turns from voice onset; the silence before it is the 'record_wait' stage
+        turn_start=lambda turn: turn['speech_started']
+    )
+    active_pipelines[session_id] = pipeline
+    pipeline.start()
+    pipeline.join()
 
     
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule, not the path, so /uploads/<name> is one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
 @app.route('/')
 def home():
     devices = list_audio_devices()
@@ -376,19 +839,172 @@ def start_conversation():
     device_id = request.json.get('deviceId')
     if device_id is not None:
         device_id = int(device_id)
+    session_id = request.json.get('sessionId') or uuid.uuid4().hex[:12]
     
-    thread = threading.Thread(target=conversation_loop, args=(device_id,))
+    thread = threading.Thread(target=conversation_loop, args=(device_id, session_id))
     thread.daemon = True
     thread.start()
-    return jsonify({"status": "Conversation started", "deviceId": device_id})
+    return jsonify({"status": "Conversation started", "deviceId": device_id, "sessionId": session_id})
+
+def parse_history_filters():
+    """
+    Read paging and filter query parameters shared by the history endpoints:
+    session, emotion, since (message id cursor), start_time/end_time (epoch
+    seconds), offset and limit.
+    """
+    args = request.args
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', type=int)
+    after_seq = args.get('since', type=int)
+    start_time = args.get('start_time', type=float)
+    end_time = args.get('end_time', type=float)
+    if ('limit' in args and limit is None) or ('offset' in args and offset is None):
+        raise ValueError("offset and limit must be non-negative integers")
+    limit = HISTORY_PAGE_SIZE if limit is None else limit
+    offset = offset or 0
+    if limit < 0 or offset < 0:
+        raise ValueError("offset and limit must be non-negative integers")
+    if 'since' in args and (after_seq is None or after_seq < 0):
+        raise ValueError("since must be a non-negative message id")
+    if ('start_time' in args and start_time is None) or ('end_time' in args and end_time is None):
+        raise ValueError("start_time and end_time must be epoch seconds")
+    return {
+        'session_id': args.get('session') or None,
+        'label': args.get('emotion') or None,
+        'after_seq': after_seq,
+        'start_time': start_time,
+        'end_time': end_time,
+        'offset': offset,
+        'limit': min(limit, HISTORY_MAX_PAGE_SIZE)
+    }
+
+def history_response(store):
+    """
+    Serve a filtered page of a HistoryStore.
+
+    With ?since=<id> only records newer than that id are returned, oldest
+    first, so polling clients pay for new messages only. The ETag changes
+    whenever the store receives a record, letting unchanged polls short-circuit
+    to 304 before any query work is done.
+    """
+    try:
+        filters = parse_history_filters()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
+
+    etag = f"{store.last_seq}-{zlib.crc32(request.query_string):08x}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    if filters['after_seq'] is not None:
+        limit = filters.pop('limit')
+        filters['offset'] = 0
+        records, total = store.query(**filters)
+        records = records[:limit]
+    else:
+        records, total = store.query(**filters)
+
+    response = jsonify(records)
+    response.set_etag(etag)
+    response.headers['X-Total-Count'] = str(total)
+    last_id = records[-1]['id'] if records else (filters['after_seq'] or 0)
+    response.headers['X-Last-Id'] = str(last_id)
+    return response
 
 @app.route('/get_messages')
 def get_messages():
-    return jsonify(conversation_history)
+    return history_response(conversation_history)
+
+@app.route('/pipeline_stats')
+def get_pipeline_stats():
+    stats = {session_id: pipeline.stats() for session_id, pipeline in active_pipelines.items()}
+    return jsonify({'pipelines': stats, 'last_endpoint': audio_recorder.last_turn})
+
+@app.route('/events')
+def events():
+    """Server-Sent Events stream of conversation updates (transcription, emotion, response, tts_done)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    return Response(
+        stream_with_context(event_bus.stream(last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/emotion_history')
 def get_emotion_history():
-    return jsonify(emotion_detector.get_emotion_history())
+    return history_response(emotion_detector.emotions_history)
+
+@app.route('/warmup', methods=['POST'])
+def warmup():
+    """Build the requested services (or all of them) ahead of the first real request"""
+    payload = request.get_json(silent=True) or {}
+    results = services.warm_up(payload.get('services'))
+    return jsonify({"status": "ok", "services": results})
+
+@app.route('/startup_report')
+def startup_report():
+    report = services.startup_report()
+    report['import_seconds'] = APP_IMPORT_SECONDS
+    return jsonify(report)
+
+@app.route('/emotion_stats')
+def get_emotion_stats():
+    return jsonify(services.get('emotion_engine').stats())
+
+@app.route('/intent_stats')
+def get_intent_stats():
+    router = services.get('intent_router')
+    if hasattr(router, 'stats'):
+        return jsonify(dict(router.stats(), router='embedding'))
+    return jsonify({"router": "keywords"})
+
+@app.route('/http_stats')
+def get_http_stats():
+    """Latency and error counts per outbound API endpoint"""
+    if not services.is_loaded('http_client'):
+        return jsonify({})
+    return jsonify(services.get('http_client').stats())
+
+@app.route('/weather_stats')
+def get_weather_stats():
+    return jsonify(services.get('weather_service').cache_stats())
+
+@app.route('/music_stats')
+def get_music_stats():
+    stats = {'youtube': services.get('youtube_helper').stats()}
+    library = services.get('music_library')
+    if library:
+        stats['library'] = library.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage, LLM and route latencies and token counts in the Prometheus text format"""
+    return Response(metrics.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/metrics_summary')
+def metrics_summary():
+    """Rolling p50/p90/p99 latencies over the last few minutes, per metric and label set"""
+    return jsonify(metrics.summary())
+
+@app.route('/llm_stats')
+def get_llm_stats():
+    """LLM calls made, answered from the response cache, and their latency, retries and tokens per model"""
+    if not services.is_loaded('llm'):
+        return jsonify({})
+    return jsonify(services.get('llm').stats())
+
+@app.route('/tts_stats')
+def get_tts_stats():
+    stats = services.get('tts').stats()
+    stats['playback'] = audio_player.stats()
+    return jsonify(stats)
 
 @app.route('/code_explainer')
 def code_explainer():
@@ -404,6 +1020,7 @@ def analyze_code():
     file = request.files['file']
     
     try:
+        code_vision_service = services.get('code_vision_service')
         result = code_vision_service.process_image(file)
         
         if result['status'] == 'success':
@@ -436,6 +1053,7 @@ def analyze_data():
         return jsonify({'status': 'error', 'error': 'No file uploaded'})
     
     file = request.files['file']
+    data_analysis_service = services.get('data_analysis_service')
     if not file or not data_analysis_service.allowed_file(file.filename):
         return jsonify({'status': 'error', 'error': 'Invalid file type. Please upload a CSV or Excel file.'})
     
@@ -474,8 +1092,9 @@ def generate_visualization():
                 'status': 'error',
                 'error': 'Missing required parameters'
             })
+        import pandas as pd
         df = pd.DataFrame(data['data'])
-        result = data_analysis_service.generate_custom_visualization(
+        result = services.get('data_analysis_service').generate_custom_visualization(
             df, data['type'], data['params']
         )
         
@@ -489,6 +1108,8 @@ def generate_visualization():
         })
 
 
+APP_IMPORT_SECONDS = round(time.perf_counter() - APP_IMPORT_STARTED, 4)
+
 if __name__ == '__main__':
     print("🚀 Starting voice chat server with emotion detection...")
     print("Available audio input devices:")
@@ -0,0 +1,108 @@
+#audio_buffer.py
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, sample_rate: int, channels: int = 1, max_seconds: float = 60,
+                 pre_roll_seconds: float = 0.3, initial_seconds: float = 10, dtype=np.float32):
+        """
+        Preallocated sample buffer for the real-time audio callback.
+
+        Blocks are copied into one contiguous array instead of being appended as
+        separate copies, so the callback does no per-block allocation and the
+        finished utterance is handed out as a zero-copy view. The array doubles
+        in size when needed, up to max_seconds, after which further audio is
+        dropped and `full` is set.
+
+        While not recording, the most recent pre_roll_seconds of audio are kept in
+        a small ring so the onset of speech (which triggers recording) isn't clipped.
+
+        Args:
+            sample_rate: Samples per second
+            channels: Number of channels per sample
+            max_seconds: Hard cap on the length of one recording
+            pre_roll_seconds: Audio kept from before recording starts
+            initial_seconds: Size of the initial allocation
+            dtype: Sample type
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_samples = int(sample_rate * max_seconds)
+        initial = min(self.max_samples, max(1, int(sample_rate * initial_seconds)))
+        self._data = np.zeros((initial, channels), dtype=dtype)
+        self._length = 0
+        self.full = False
+
+        self._pre_roll = np.zeros((max(0, int(sample_rate * pre_roll_seconds)), channels), dtype=dtype)
+        self._pre_roll_pos = 0
+        self._pre_roll_filled = 0
+
+    def reset(self):
+        """Forget recorded audio while keeping the allocation for the next utterance"""
+        self._length = 0
+        self.full = False
+        self._pre_roll_pos = 0
+        self._pre_roll_filled = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def seconds(self) -> float:
+        return self._length / self.sample_rate
+
+    def _grow(self, needed: int):
+        capacity = len(self._data)
+        while capacity < needed:
+            capacity *= 2
+        capacity = min(capacity, self.max_samples)
+        grown = np.zeros((capacity, self.channels), dtype=self._data.dtype)
+        grown[:self._length] = self._data[:self._length]
+        self._data = grown
+
+    def append(self, block: np.ndarray):
+        """Copy a block of samples onto the end of the recording"""
+        if self.full:
+            return
+        frames = len(block)
+        needed = self._length + frames
+        if needed > len(self._data) and len(self._data) < self.max_samples:
+            self._grow(needed)
+        room = len(self._data) - self._length
+        if frames >= room:
+            frames = room
+            self.full = self._length + frames >= self.max_samples
+        self._data[self._length:self._length + frames] = block[:frames]
+        self._length += frames
+
+    def write_pre_roll(self, block: np.ndarray):
+        """Keep the latest samples seen while not recording"""
+        size = len(self._pre_roll)
+        if size == 0:
+            return
+        block = block[-size:]
+        frames = len(block)
+        first = min(frames, size - self._pre_roll_pos)
+        self._pre_roll[self._pre_roll_pos:self._pre_roll_pos + first] = block[:first]
+        if frames > first:
+            self._pre_roll[:frames - first] = block[first:]
+        self._pre_roll_pos = (self._pre_roll_pos + frames) % size
+        self._pre_roll_filled = min(size, self._pre_roll_filled + frames)
+
+    def start(self):
+        """Begin a recording, seeded with the buffered pre-roll audio"""
+        self._length = 0
+        self.full = False
+        filled = self._pre_roll_filled
+        if filled:
+            start = (self._pre_roll_pos - filled) % len(self._pre_roll)
+            if start + filled <= len(self._pre_roll):
+                self.append(self._pre_roll[start:start + filled])
+            else:
+                self.append(self._pre_roll[start:])
+                self.append(self._pre_roll[:self._pre_roll_pos])
+        self._pre_roll_filled = 0
+
+    def view(self) -> np.ndarray:
+        """Zero-copy view of the recorded samples; valid until the next reset/start"""
+        return self._data[:self._length]
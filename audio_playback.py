@@ -0,0 +1,292 @@
+#audio_playback.py
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+class PlaybackItem:
+    def __init__(self, samples=None, sample_rate: int = 0, buffer=None, suffix: str = '.mp3',
+                 group=None, callback: Optional[Callable[[], None]] = None):
+        """One queued clip (decoded samples, or an encoded buffer for the file fallback) or callback."""
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.buffer = buffer
+        self.suffix = suffix
+        self.group = group
+        self.callback = callback
+        self.interrupted = False
+        self.done = threading.Event()
+
+    @property
+    def is_audio(self) -> bool:
+        return self.callback is None
+
+
+class AudioPlayer:
+    def __init__(self, spool_to_disk: bool = False, device=None, blocksize: int = 1024):
+        """
+        Queued, non-blocking speech output.
+
+        Clips are decoded by the caller and played one after another from a
+        worker thread through a sounddevice output stream, so callers never wait
+        for playback and the next sentence can be synthesized while the current
+        one is playing. interrupt() stops the current clip within one block and
+        drops everything queued for the same reply (barge-in).
+
+        Args:
+            spool_to_disk: Always play through a temp file and playsound
+            device: sounddevice output device (None for the default)
+            blocksize: Frames per output block; bounds how fast interrupt() takes effect
+        """
+        self.spool_to_disk = spool_to_disk
+        self.device = device
+        self.blocksize = blocksize
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._current: Optional[PlaybackItem] = None
+        self._interrupt = threading.Event()
+        # Set by request_interrupt(); handled on the playback thread
+        self._interrupt_requested = threading.Event()
+        # Replies that were interrupted; later sentences of them are dropped
+        self._cancelled_groups = deque(maxlen=32)
+        self._thread = None
+        self._running = False
+        self.played = 0
+        self.interrupted = 0
+        self.dropped = 0
+        self.played_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="audio-playback", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, buffer, suffix: str = '.mp3', group=None) -> PlaybackItem:
+        """
+        Queue encoded audio for playback and return immediately.
+
+        Args:
+            buffer: File-like object with encoded audio (WAV, MP3, ...)
+            suffix: File extension, used by the temp-file fallback
+            group: Identifies the reply the clip belongs to, for barge-in
+
+        Returns:
+            PlaybackItem whose `done` event is set once it has played or was dropped
+        """
+        item = PlaybackItem(buffer=buffer, suffix=suffix, group=group)
+        if group is not None and group in self._cancelled_groups:
+            self._finish(item, interrupted=True)
+            self.dropped += 1
+            return item
+
+        if not self.spool_to_disk:
+            try:
+                import soundfile as sf
+                item.samples, item.sample_rate = sf.read(buffer, dtype='float32', always_2d=True)
+            except Exception as e:
+                print(f"In-memory playback unavailable, spooling to disk: {str(e)}")
+                buffer.seek(0)
+
+        with self._cond:
+            self._queue.append(item)
+            self._cond.notify()
+        self._ensure_thread()
+        return item
+
+    def call_after(self, callback: Callable[[], None]) -> PlaybackItem:
+        """Run callback on the playback thread once everything queued before it has played"""
+        item = PlaybackItem(callback=callback)
+        with self._cond:
+            self._queue.append(item)
+            self._cond.notify()
+        self._ensure_thread()
+        return item
+
+    def interrupt(self) -> bool:
+        """
+        Stop the current clip and drop queued clips. Takes the player's lock, so
+        audio callbacks should use request_interrupt() instead.
+
+        Returns:
+            True if anything was playing or queued
+        """
+        with self._cond:
+            stopped = False
+            if self._current is not None and self._current.is_audio:
+                self._cancel_group(self._current.group)
+                self._interrupt.set()
+                stopped = True
+            stopped = self._drop_queued() or stopped
+            if stopped:
+                self.interrupted += 1
+            return stopped
+
+    def request_interrupt(self) -> bool:
+        """
+        Interrupt from a real-time thread (the input stream callback) without
+        taking the player's lock: only flags the request, which stops the current
+        clip within one block. Cancelling the reply and dropping the queue
+        happen on the playback thread.
+
+        Returns:
+            True if anything was playing or queued
+        """
+        if not self.is_playing:
+            return False
+        self._interrupt_requested.set()
+        self._interrupt.set()
+        return True
+
+    def _drop_queued(self) -> bool:
+        """Finish queued clips as interrupted and cancel their replies; call with _cond held"""
+        dropped = False
+        remaining = deque()
+        for item in self._queue:
+            if item.is_audio:
+                self._cancel_group(item.group)
+                self._finish(item, interrupted=True)
+                self.dropped += 1
+                dropped = True
+            else:
+                remaining.append(item)
+        self._queue = remaining
+        return dropped
+
+    def _handle_interrupt_request(self, current: Optional[PlaybackItem] = None):
+        """Carry out a request_interrupt(); call with _cond held"""
+        self._interrupt_requested.clear()
+        if current is not None and current.is_audio:
+            self._cancel_group(current.group)
+            current.interrupted = True
+        self._drop_queued()
+        self.interrupted += 1
+
+    def is_cancelled(self, group) -> bool:
+        """True if the reply `group` was interrupted, so the rest of it needn't be synthesized"""
+        return group is not None and group in self._cancelled_groups
+
+    def _cancel_group(self, group):
+        if group is not None and group not in self._cancelled_groups:
+            self._cancelled_groups.append(group)
+
+    @property
+    def is_playing(self) -> bool:
+        """True while a clip is playing or waiting to be played"""
+        current = self._current
+        if current is not None and current.is_audio:
+            return True
+        return any(item.is_audio for item in list(self._queue))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue is empty; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._current is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def shutdown(self):
+        self.interrupt()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def _finish(self, item: PlaybackItem, interrupted: bool = False):
+        item.interrupted = interrupted
+        item.buffer = None
+        item.samples = None
+        item.done.set()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                self._interrupt.clear()
+                if self._interrupt_requested.is_set():
+                    # Requested between clips: nothing is playing, drop the queue
+                    self._handle_interrupt_request()
+                    continue
+                item = self._queue.popleft()
+                self._current = item
+
+            try:
+                if item.callback is not None:
+                    item.callback()
+                else:
+                    start = time.perf_counter()
+                    if item.samples is not None:
+                        self._play_stream(item)
+                    else:
+                        self._play_file(item)
+                    self.played_seconds += time.perf_counter() - start
+                    if self._interrupt.is_set():
+                        item.interrupted = True
+                    else:
+                        self.played += 1
+            except Exception as e:
+                print(f"Error playing audio: {str(e)}")
+            finally:
+                with self._cond:
+                    if self._interrupt_requested.is_set():
+                        self._handle_interrupt_request(item)
+                    self._finish(item, item.interrupted)
+                    self._current = None
+                    self._cond.notify_all()
+
+    def _play_stream(self, item: PlaybackItem):
+        import sounddevice as sd
+
+        samples = item.samples
+        position = 0
+        finished = threading.Event()
+
+        def callback(outdata, frames, time_info, status):
+            nonlocal position
+            if self._interrupt.is_set():
+                outdata.fill(0)
+                raise sd.CallbackStop
+            chunk = samples[position:position + frames]
+            count = len(chunk)
+            outdata[:count] = chunk
+            position += count
+            if count < frames:
+                outdata[count:] = 0
+                raise sd.CallbackStop
+
+        with sd.OutputStream(samplerate=item.sample_rate, channels=samples.shape[1], dtype='float32',
+                             device=self.device, blocksize=self.blocksize,
+                             callback=callback, finished_callback=finished.set):
+            finished.wait()
+
+    def _play_file(self, item: PlaybackItem):
+        # playsound blocks until the clip ends, so interrupt() only drops what is queued
+        from playsound import playsound
+        fd, path = tempfile.mkstemp(prefix='response_', suffix=item.suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(item.buffer.getvalue())
+            playsound(path)
+        finally:
+            os.remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = sum(1 for item in self._queue if item.is_audio)
+        return {
+            'playing': self.is_playing,
+            'queued': queued,
+            'played': self.played,
+            'interrupted': self.interrupted,
+            'dropped': self.dropped,
+            'played_seconds': round(self.played_seconds, 2)
+        }
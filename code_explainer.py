@@ -5,9 +5,10 @@ import os
 import PIL.Image
 from typing import Dict, Any
 import time
+from llm_client import LLMClient
 
 class CodeVisionService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, llm: LLMClient = None, model=None):
         """
         Initialize the CodeVisionService with Google's Gemini Vision API.
         
@@ -17,10 +18,15 @@ class CodeVisionService:
         
         Args:
             api_key: Your Google API key for accessing Gemini
+            llm: LLMClient the requests go through, so a re-uploaded image is
+                answered from its cache
+            model: Generative model to use instead of gemini-1.5-flash (e.g. a FakeLLMProvider)
         """
-        genai.configure(api_key=api_key)
-        
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        if model is None:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = model
+        self.llm = llm or LLMClient()
         
         self.allowed_extensions = {'png', 'jpg', 'jpeg'}
         self.upload_folder = 'uploads'
@@ -71,8 +77,7 @@ class CodeVisionService:
 
             Please keep explanations concise but informative, using simple language where possible."""
 
-            response = self.model.generate_content([prompt, image])
-            explanation = self._format_explanation(response.text)
+            explanation = self._format_explanation(self.llm.generate(self.model, [prompt, image]))
             
             return {
                 "status": "success",
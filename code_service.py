@@ -1,5 +1,6 @@
 #code_service.py
 from openai import OpenAI
+from llm_client import LLMClient
 import re
 import os
 import difflib
@@ -9,8 +10,113 @@ import subprocess
 from typing import Dict, Optional, Union
 from datetime import datetime
 
+CODE_PHRASES = {
+    'generate': [
+        'write a python program',
+        'create a python program',
+        'write a program in python',
+        'create a program in python',
+        'write python code',
+        'generate python code',
+        'write a python script',
+        'make a python program',
+        'code a python program',
+        'implement a python program',
+        'develop a python program',
+        'help me write a python program',
+        'can you write a python program',
+        'could you create a python program',
+        'help me to write a python program',
+        'i need a python program',
+        'create code for',
+        'write code for'
+    ],
+    'edit': [
+        'edit the python code',
+        'modify the python code',
+        'update the python code',
+        'fix the python code',
+        'change the python code',
+        'refactor the python code',
+        'help me edit the python code',
+        'can you modify the python code',
+        'edit code in',
+        'modify code in',
+        'update code in',
+        'change code in',
+        'fix code in'
+    ]
+}
+# Fallback: "python" together with one of the other words is treated as a generate request
+CODE_GENERIC_WORDS = ['python', 'program', 'code', 'script']
+
+EDIT_FILE_PATTERNS = [re.compile(pattern) for pattern in [
+    r'in file (\S+\.py)',
+    r'in (\S+\.py)',
+    r'(\S+\.py) file',
+    r'edit (\S+\.py)',
+    r'modify (\S+\.py)',
+    r'update (\S+\.py)',
+    r'fix (\S+\.py)',
+    r'in file (\S+)(?!\.py)',
+    r'edit (\S+)(?!\.py)',
+    r'modify (\S+)(?!\.py)'
+]]
+
+
+def _phrase_regex(phrases):
+    """One alternation over all phrases, longest first so overlapping phrases are removed whole"""
+    return re.compile('|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)))
+
+_GENERATE_RE = _phrase_regex(CODE_PHRASES['generate'])
+_EDIT_RE = _phrase_regex(CODE_PHRASES['edit'])
+_GENERIC_RE = _phrase_regex(CODE_GENERIC_WORDS)
+
+
+def build_generate_request(text: str) -> Dict[str, str]:
+    """Request dict for a matched 'generate' phrase: the text minus the trigger phrases"""
+    task = _GENERATE_RE.sub('', text.lower()).strip(' .,?!')
+    return {
+        "type": "generate",
+        "request": ' and '.join(part.strip() for part in task.split(' and ')),
+        "original_text": text
+    }
+
+
+def build_edit_request(text: str) -> Dict[str, str]:
+    """Request dict for a matched 'edit' phrase, with the target file if one is named"""
+    text_lower = text.lower()
+    file_path = None
+    for pattern in EDIT_FILE_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            file_path = match.group(1)
+            if not file_path.endswith('.py'):
+                file_path += '.py'
+            break
+
+    edit_instruction = text_lower
+    if file_path:
+        edit_instruction = _EDIT_RE.sub('', edit_instruction.replace(file_path, '')).strip()
+    return {
+        "type": "edit",
+        "request": edit_instruction,
+        "file_path": file_path,
+        "original_text": text
+    }
+
+
+def build_generic_request(text: str) -> Dict[str, str]:
+    """Request dict for the 'python' + program/code/script fallback"""
+    return {
+        "type": "generate",
+        "request": _GENERIC_RE.sub('', text.lower()).strip(),
+        "original_text": text
+    }
+
+
 class CodeHandler:
-    def __init__(self, openai_client):
+    def __init__(self, openai_client, llm=None):
         """
         Initialize CodeHandler with OpenAI client and enhanced functionality.
         
@@ -19,47 +125,13 @@ class CodeHandler:
         
         Args:
             openai_client: An instance of the OpenAI client for API interactions
+            llm: LLMClient that program generation goes through (cached by prompt)
         """
         self.client = openai_client
+        self.llm = llm or LLMClient(openai_client)
         self.current_file = None
         self.current_code = None
-        self.code_phrases = {
-            'generate': [
-                'write a python program',
-                'create a python program',
-                'write a program in python',
-                'create a program in python',
-                'write python code',
-                'generate python code',
-                'write a python script',
-                'make a python program',
-                'code a python program',
-                'implement a python program',
-                'develop a python program',
-                'help me write a python program',
-                'can you write a python program',
-                'could you create a python program',
-                'help me to write a python program',
-                'i need a python program',
-                'create code for',
-                'write code for'
-            ],
-            'edit': [
-                'edit the python code',
-                'modify the python code',
-                'update the python code',
-                'fix the python code',
-                'change the python code',
-                'refactor the python code',
-                'help me edit the python code',
-                'can you modify the python code',
-                'edit code in',
-                'modify code in',
-                'update code in',
-                'change code in',
-                'fix code in'
-            ]
-        }
+        self.code_phrases = CODE_PHRASES
 
     def generate_filename(self, request: str) -> str:
         """
@@ -147,15 +219,13 @@ class CodeHandler:
             4. Input validation when needed
             Return only the code without any explanations outside the code."""
             
-            response = self.client.chat.completions.create(
+            code = self.llm.chat(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": f"Write a Python program that {request}"}
                 ]
             )
-            
-            code = response.choices[0].message.content
             code = code.replace('```python', '').replace('```', '').strip()
             
             # Add docstring if not present
@@ -222,15 +292,14 @@ class CodeHandler:
             
             Current code:
             {current_code}"""
-            response = self.client.chat.completions.create(
+            modified_code = self.llm.chat(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": f"Make these specific changes: {edit_request}"}
-                ]
+                ],
+                bypass=True
             )
-            
-            modified_code = response.choices[0].message.content
             modified_code = modified_code.replace('```python', '').replace('```', '').strip()
             backup_path = f"{abs_file_path}.backup"
             with open(backup_path, 'w', encoding='utf-8') as f:
@@ -294,75 +363,12 @@ class CodeHandler:
             Dictionary containing request type and details, or None if not a code request
         """
         text_lower = text.lower()
-        for phrase in self.code_phrases['generate']:
-            if phrase in text_lower:
-                task = text_lower
-                
-                for remove_phrase in self.code_phrases['generate']:
-                    task = task.replace(remove_phrase, '')
-                task = task.strip(' .,?!')
-                
-                task_parts = []
-                for part in task.split(' and '):
-                    task_parts.append(part.strip())
-                
-                final_task = ' and '.join(task_parts)
-                
-                return {
-                    "type": "generate",
-                    "request": final_task,
-                    "original_text": text  
-                }
-        
-        for phrase in self.code_phrases['edit']:
-            if phrase in text_lower:
-                file_patterns = [
-                    r'in file (\S+\.py)',
-                    r'in (\S+\.py)',
-                    r'(\S+\.py) file',
-                    r'edit (\S+\.py)',
-                    r'modify (\S+\.py)',
-                    r'update (\S+\.py)',
-                    r'fix (\S+\.py)',
-                    r'in file (\S+)(?!\.py)',
-                    r'edit (\S+)(?!\.py)',
-                    r'modify (\S+)(?!\.py)'
-                ]
-                
-                file_path = None
-                for pattern in file_patterns:
-                    match = re.search(pattern, text_lower)
-                    if match:
-                        file_path = match.group(1)
-                        if not file_path.endswith('.py'):
-                            file_path += '.py'
-                        break
-                
-                edit_instruction = text_lower
-                if file_path:
-                    edit_instruction = edit_instruction.replace(file_path, '').strip()
-                    for phrase in self.code_phrases['edit']:
-                        edit_instruction = edit_instruction.replace(phrase, '').strip()
-                
-                return {
-                    "type": "edit",
-                    "request": edit_instruction,
-                    "file_path": file_path,
-                    "original_text": text
-                }
-        
-        if ('python' in text_lower and 
-            ('program' in text_lower or 'code' in text_lower or 'script' in text_lower)):
-            request = text_lower
-            for word in ['python', 'program', 'code', 'script']:
-                request = request.replace(word, '')
-            request = request.strip()
-            
-            return {
-                "type": "generate",
-                "request": request,
-                "original_text": text
-            }
+        if _GENERATE_RE.search(text_lower):
+            return build_generate_request(text)
+        if _EDIT_RE.search(text_lower):
+            return build_edit_request(text)
+        if 'python' in text_lower and ('program' in text_lower or 'code' in text_lower or 'script' in text_lower):
+            return build_generic_request(text)
         
         return None
     
\ No newline at end of file
@@ -0,0 +1,216 @@
+#conversation_pipeline.py
+import inspect
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class StageMetrics:
+    def __init__(self):
+        """Running latency counters for one pipeline stage."""
+        self.processed = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.first_output_total = 0.0
+        self.first_output_count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, failed: bool = False, first_output: Optional[float] = None):
+        with self._lock:
+            if failed:
+                self.errors += 1
+                return
+            self.processed += 1
+            self.total_seconds += seconds
+            self.last_seconds = seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if first_output is not None:
+                self.first_output_total += first_output
+                self.first_output_count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {
+                'processed': self.processed,
+                'errors': self.errors,
+                'avg_ms': round(self.total_seconds / self.processed * 1000, 2) if self.processed else 0,
+                'max_ms': round(self.max_seconds * 1000, 2),
+                'last_ms': round(self.last_seconds * 1000, 2)
+            }
+            if self.first_output_count:
+                snapshot['avg_first_output_ms'] = round(self.first_output_total / self.first_output_count * 1000, 2)
+            return snapshot
+
+
+class ConversationPipeline:
+    def __init__(self, source: Callable[[], Any], stages: List[Tuple[str, Callable[[Any], Any]]],
+                 queue_size: int = 2, on_error: Optional[Callable[[str, Any, Exception], None]] = None,
+                 source_name: str = 'record', observer: Optional[Callable[[str, float, bool], None]] = None,
+                 is_turn_end: Optional[Callable[[Any], bool]] = None,
+                 turn_start: Optional[Callable[[Any], Optional[float]]] = None):
+        """
+        Staged pipeline with one worker thread per stage and bounded queues between them.
+
+        The source (e.g. microphone capture) runs continuously in its own thread,
+        so the next utterance is recorded while earlier ones are still being
+        transcribed, answered and spoken. Bounded queues provide backpressure: if
+        downstream stages fall behind, the source blocks instead of piling up turns.
+
+        Args:
+            source: Callable producing the next item; called in a loop
+            stages: Ordered (name, fn) pairs; fn returns the item for the next
+                stage, None to drop it, or a generator whose items are each
+                forwarded as soon as they are yielded (e.g. streamed sentences)
+            queue_size: Maximum items waiting in front of each stage
+            on_error: Called as on_error(stage_name, item, exception) when a
+                stage or the source raises
+            source_name: Name the source is reported under in stats()
+            observer: Called as observer(stage_name, seconds, failed) after each
+                source call and stage run, and as observer('turn', seconds, False)
+                once per turn, when it leaves the last stage (e.g. to export metrics)
+            is_turn_end: Tells whether an item leaving the last stage completes its
+                turn; needed when a stage streams several items per turn, so
+                the turn is timed once, at its final item. By default every
+                item completes a turn.
+            turn_start: Returns the time.perf_counter() at which a source item's
+                turn began (e.g. speech onset). Turn and source latencies are
+                measured from there, and the wait before it is reported as the
+                '<source_name>_wait' stage. By default turns start when the
+                source is called.
+        """
+        self.source = source
+        self.source_name = source_name
+        self.stages = stages
+        self.on_error = on_error
+        self.observer = observer
+        self.is_turn_end = is_turn_end
+        self.turn_start = turn_start
+        self.wait_name = f"{source_name}_wait"
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.metrics = {source_name: StageMetrics()}
+        if turn_start is not None:
+            self.metrics[self.wait_name] = StageMetrics()
+        self.metrics.update({name: StageMetrics() for name, _ in stages})
+        self.turn_metrics = StageMetrics()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run_source, name=f"pipeline-{self.source_name}", daemon=True)]
+        for index, (name, _) in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(index,), name=f"pipeline-{name}", daemon=True
+            ))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _put(self, index: int, item):
+        """Blocking put that still notices stop() while the queue is full"""
+        while not self._stop.is_set():
+            try:
+                self.queues[index].put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _observe(self, name: str, seconds: float, failed: bool = False):
+        if self.observer:
+            try:
+                self.observer(name, seconds, failed)
+            except Exception as e:
+                print(f"Error in pipeline observer: {str(e)}")
+
+    def _handle_error(self, name: str, item, error: Exception):
+        print(f"Error in pipeline stage '{name}': {str(error)}")
+        if self.on_error:
+            try:
+                self.on_error(name, item, error)
+            except Exception as handler_error:
+                print(f"Error in pipeline error handler: {str(handler_error)}")
+
+    def _run_source(self):
+        metrics = self.metrics[self.source_name]
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                item = self.source()
+            except Exception as e:
+                metrics.record(0, failed=True)
+                self._observe(self.source_name, time.perf_counter() - start, failed=True)
+                self._handle_error(self.source_name, None, e)
+                time.sleep(1)
+                continue
+            end = time.perf_counter()
+            started = start
+            if item is not None and self.turn_start is not None:
+                started = min(max(start, self.turn_start(item) or start), end)
+                self.metrics[self.wait_name].record(started - start)
+                self._observe(self.wait_name, started - start)
+            metrics.record(end - started)
+            self._observe(self.source_name, end - started)
+            if item is not None and self.stages:
+                self._put(0, (item, started))
+
+    def _run_stage(self, index: int):
+        name, fn = self.stages[index]
+        metrics = self.metrics[name]
+        while not self._stop.is_set():
+            try:
+                item, turn_started = self.queues[index].get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            start = time.perf_counter()
+            first_output = None
+            streamed = False
+            try:
+                result = fn(item)
+                if inspect.isgenerator(result):
+                    streamed = True
+                    for output in result:
+                        if first_output is None:
+                            first_output = time.perf_counter() - start
+                        self._forward(index, output, turn_started)
+            except Exception as e:
+                metrics.record(0, failed=True)
+                self._observe(name, time.perf_counter() - start, failed=True)
+                self._handle_error(name, item, e)
+                continue
+            metrics.record(time.perf_counter() - start, first_output=first_output)
+            self._observe(name, time.perf_counter() - start)
+            if not streamed:
+                self._forward(index, result, turn_started)
+
+    def _forward(self, index: int, result, turn_started: float):
+        if index == len(self.stages) - 1:
+            if self.is_turn_end is not None and not self.is_turn_end(result):
+                return
+            seconds = time.perf_counter() - turn_started
+            self.turn_metrics.record(seconds)
+            self._observe('turn', seconds)
+        elif result is not None:
+            self._put(index + 1, (result, turn_started))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage latency counters, current queue depths and end-to-end turn latency"""
+        stages = {}
+        for name, metrics in self.metrics.items():
+            stages[name] = metrics.snapshot()
+        for index, (name, _) in enumerate(self.stages):
+            stages[name]['queue_depth'] = self.queues[index].qsize()
+        return {
+            'running': not self._stop.is_set() and any(t.is_alive() for t in self._threads),
+            'stages': stages,
+            'turn': self.turn_metrics.snapshot()
+        }
@@ -7,12 +7,20 @@ from typing import Dict, Any, List
 import json
 import google.generativeai as genai
 from scipy.stats import chi2_contingency
+from llm_client import LLMClient
 
 class DataAnalysisService:
-    def __init__(self, api_key: str):
-        """Initialize the data analysis service with Gemini API"""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+    def __init__(self, api_key: str, llm: LLMClient = None, model=None):
+        """
+        Initialize the data analysis service with Gemini API. Prompts go through
+        `llm`, so re-analysing the same file is answered from its cache; `model`
+        replaces gemini-pro (e.g. with a FakeLLMProvider).
+        """
+        if model is None:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel('gemini-pro')
+        self.model = model
+        self.llm = llm or LLMClient()
         self.allowed_extensions = {'csv', 'xlsx', 'xls'}
 
     def allowed_file(self, filename: str) -> bool:
@@ -98,8 +106,7 @@ class DataAnalysisService:
                 df = pd.read_excel(file_path)
             stats = self._get_basic_stats(df)
             prompt = self._generate_analysis_prompt(df, stats)
-            response = self.model.generate_content(prompt)
-            analysis = self._format_analysis(response.text)
+            analysis = self._format_analysis(self.llm.generate(self.model, prompt))
             visualizations = self._generate_visualizations(df)
 
             return {
@@ -4,13 +4,18 @@ from docx import Document
 from docx.shared import Pt
 import time
 from openai import OpenAI
+from llm_client import LLMClient
 
 class DocumentHandler:
-    def __init__(self, openai_client):
-        """Initialize the DocumentHandler with OpenAI client and set up the documents directory."""
+    def __init__(self, openai_client, llm=None):
+        """
+        Initialize the DocumentHandler with OpenAI client and set up the documents directory.
+        Generation goes through `llm` (an LLMClient) so repeated topics come from its cache.
+        """
         self.base_path = os.getcwd()
         self.docs_folder = os.path.join(self.base_path, "generated_documents")
         self.client = openai_client
+        self.llm = llm or LLMClient(openai_client)
         try:
             os.makedirs(self.docs_folder, exist_ok=True)
             print(f"Documents will be saved in: {self.docs_folder}")
@@ -86,17 +91,17 @@ class DocumentHandler:
             
             Please provide the complete edited version of the document, maintaining the original format and structure."""
 
-            response = self.client.chat.completions.create(
+            # Edits always ask the model, but still go through the shared rate limits
+            edited_content = self.llm.chat(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are an expert editor. Edit the provided document according to the instructions while maintaining the document's original style and format. Provide only the edited content without any explanatory text."},
                     {"role": "user", "content": formatted_prompt}
                 ],
                 max_tokens=2500,
-                temperature=0.7
-            )
-            
-            edited_content = response.choices[0].message.content.strip()
+                temperature=0.7,
+                bypass=True
+            ).strip()
 
             # Save the edited content back to the original file
             try:
@@ -196,7 +201,7 @@ class DocumentHandler:
             
             Please write this as a polished, well-researched article suitable for publication."""
 
-            response = self.client.chat.completions.create(
+            content = self.llm.chat(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": """You are an expert writer and researcher. Create in-depth, 
@@ -207,10 +212,8 @@ class DocumentHandler:
                 ],
                 max_tokens=2500,
                 temperature=0.7
-            )
+            ).strip()
             
-            # Extract and clean the generated content
-            content = response.choices[0].message.content.strip()
             if not content:
                 raise ValueError("No content was generated")
             
@@ -0,0 +1,385 @@
+#emotion_service.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+EMOTION_BACKENDS = ('pytorch', 'quantized', 'onnx')
+
+
+class PyTorchEmotionBackend:
+    def __init__(self, model_name: str = EMOTION_MODEL, num_threads: Optional[int] = None,
+                 quantize: bool = False):
+        """
+        Emotion classifier running through a transformers pipeline.
+
+        Args:
+            model_name: Hugging Face model id
+            num_threads: Intra-op thread count for torch (None keeps the default)
+            quantize: Apply dynamic int8 quantization to the Linear layers
+        """
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+        if num_threads:
+            torch.set_num_threads(int(num_threads))
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.name = 'quantized' if quantize else 'pytorch'
+        self.pipeline = pipeline(
+            "text-classification",
+            model=model,
+            tokenizer=tokenizer,
+            top_k=None
+        )
+
+    def classify(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Run the emotion pipeline over a batch of texts in a single padded forward pass.
+
+        Returns:
+            One list of {'label', 'score'} dicts per input text
+        """
+        results = self.pipeline(texts, batch_size=len(texts), truncation=True)
+        if len(texts) == 1 and results and isinstance(results[0], dict):
+            results = [results]
+        return [list(scores) for scores in results]
+
+
+class OnnxEmotionBackend:
+    def __init__(self, model_name: str = EMOTION_MODEL, num_threads: Optional[int] = None,
+                 model_path: Optional[str] = None):
+        """
+        Emotion classifier running on an exported ONNX Runtime session.
+
+        The model is exported once with torch.onnx and cached on disk; later
+        starts load the .onnx file directly.
+
+        Args:
+            model_name: Hugging Face model id
+            num_threads: intra_op_num_threads for the ONNX Runtime session
+            model_path: Where to cache the exported model
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx emotion backend requires onnxruntime (pip install onnxruntime)")
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.name = 'onnx'
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        config = AutoConfig.from_pretrained(model_name)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+
+        if model_path is None:
+            model_path = os.path.join("models", model_name.replace('/', '__') + ".onnx")
+        if not os.path.exists(model_path):
+            self._export(model_name, model_path)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _export(self, model_name: str, model_path: str):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        print(f"Exporting {model_name} to ONNX at {model_path}...")
+        os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        sample = self.tokenizer(["export sample"], return_tensors='pt')
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            model_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'}
+            },
+            opset_version=14
+        )
+
+    def classify(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        import numpy as np
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(None, feeds)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return [
+            [{'label': label, 'score': float(score)} for label, score in zip(self.labels, row)]
+            for row in probs
+        ]
+
+
+def create_emotion_backend(backend: str = 'pytorch', num_threads: Optional[int] = None):
+    """
+    Build the emotion classifier for the selected backend.
+
+    Args:
+        backend: One of 'pytorch', 'quantized' (dynamic int8) or 'onnx'
+        num_threads: CPU thread count for the backend
+    """
+    backend = (backend or 'pytorch').lower()
+    if backend == 'pytorch':
+        return PyTorchEmotionBackend(num_threads=num_threads)
+    if backend == 'quantized':
+        return PyTorchEmotionBackend(num_threads=num_threads, quantize=True)
+    if backend == 'onnx':
+        return OnnxEmotionBackend(num_threads=num_threads)
+    raise ValueError(f"Unknown emotion backend: {backend}. Choose from {', '.join(EMOTION_BACKENDS)}")
+
+
+def check_parity(reference, candidate, texts: List[str], tolerance: float = 0.05) -> Dict[str, Any]:
+    """
+    Compare a candidate backend's scores against a reference backend.
+
+    Returns:
+        Dictionary with the max absolute score difference, how often the dominant
+        label agrees, and whether the candidate is within tolerance
+    """
+    ref_results = reference.classify(texts)
+    cand_results = candidate.classify(texts)
+
+    max_diff = 0.0
+    agreements = 0
+    for ref_scores, cand_scores in zip(ref_results, cand_results):
+        ref_map = {s['label']: s['score'] for s in ref_scores}
+        cand_map = {s['label']: s['score'] for s in cand_scores}
+        for label, score in ref_map.items():
+            max_diff = max(max_diff, abs(score - cand_map.get(label, 0.0)))
+        if max(ref_map, key=ref_map.get) == max(cand_map, key=cand_map.get):
+            agreements += 1
+
+    return {
+        'texts': len(texts),
+        'max_abs_diff': round(max_diff, 6),
+        'label_agreement': round(agreements / len(texts), 4) if texts else 1.0,
+        'passed': max_diff <= tolerance and agreements == len(texts)
+    }
+
+
+def _resident_memory_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # ru_maxrss is the peak (KiB on Linux), close enough for a comparison
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_backends(backends: List[str], texts: List[str], repeats: int = 20,
+                       num_threads: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Measure load time, per-utterance latency and resident memory for each backend,
+    and check each non-pytorch backend's scores against pytorch.
+    """
+    import statistics
+
+    results = {}
+    loaded = {}
+    for name in backends:
+        rss_before = _resident_memory_mb()
+        start = time.perf_counter()
+        backend = create_emotion_backend(name, num_threads)
+        load_seconds = time.perf_counter() - start
+        rss_after = _resident_memory_mb()
+        loaded[name] = backend
+
+        backend.classify(texts[:1])
+        latencies = []
+        for i in range(repeats):
+            text = texts[i % len(texts)]
+            start = time.perf_counter()
+            backend.classify([text])
+            latencies.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        backend.classify(texts)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        results[name] = {
+            'load_seconds': round(load_seconds, 2),
+            'rss_delta_mb': round(rss_after - rss_before, 1),
+            'latency_ms_mean': round(statistics.mean(latencies), 2),
+            'latency_ms_p50': round(statistics.median(latencies), 2),
+            'latency_ms_max': round(max(latencies), 2),
+            f'batch_of_{len(texts)}_ms': round(batch_ms, 2)
+        }
+
+    if 'pytorch' in loaded:
+        for name, backend in loaded.items():
+            if name != 'pytorch':
+                results[name]['parity'] = check_parity(loaded['pytorch'], backend, texts)
+    return results
+
+
+class BatchInferenceEngine:
+    def __init__(self, infer_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16, max_wait_ms: float = 10):
+        """
+        Micro-batching inference server.
+
+        Callers submit single inputs and get a Future back. A worker thread
+        coalesces whatever is pending (up to max_batch_size, waiting at most
+        max_wait_ms after the first item) into one call to infer_batch, so
+        concurrent sessions share forward passes instead of serializing.
+
+        Args:
+            infer_batch: Callable mapping a list of inputs to a list of outputs
+            max_batch_size: Upper bound on inputs per forward pass
+            max_wait_ms: How long to wait for more inputs once one is pending
+        """
+        self.infer_batch = infer_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._running = True
+        self._batches = 0
+        self._items = 0
+        self._busy_seconds = 0.0
+        self._max_batch_seen = 0
+        self._last_batch = None
+
+    def submit(self, item: Any) -> Future:
+        """Queue a single input for inference and return a Future for its result"""
+        if not self._running:
+            raise RuntimeError("Inference engine has been shut down")
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def infer(self, item: Any, timeout: float = None) -> Any:
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            pending = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not pending:
+                continue
+
+            start = time.perf_counter()
+            try:
+                outputs = self.infer_batch([entry[0] for entry in pending])
+                if len(outputs) != len(pending):
+                    raise ValueError(f"Expected {len(pending)} outputs, got {len(outputs)}")
+                for (_, future, _), output in zip(pending, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                print(f"Error in batch inference: {str(e)}")
+                for _, future, _ in pending:
+                    future.set_exception(e)
+            finished = time.perf_counter()
+            self._record_batch(pending, start, finished)
+
+    def _record_batch(self, pending, start, finished):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(pending)
+            self._busy_seconds += finished - start
+            self._max_batch_seen = max(self._max_batch_seen, len(pending))
+            self._last_batch = {
+                'size': len(pending),
+                'inference_ms': round((finished - start) * 1000, 2),
+                'max_queue_wait_ms': round(max(start - queued for _, _, queued in pending) * 1000, 2)
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and per-batch latency statistics"""
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                'batches': batches,
+                'items': self._items,
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'avg_batch_size': round(self._items / batches, 2) if batches else 0,
+                'largest_batch': self._max_batch_seen,
+                'avg_batch_latency_ms': round(self._busy_seconds / batches * 1000, 2) if batches else 0,
+                'throughput_items_per_sec': round(self._items / self._busy_seconds, 2) if self._busy_seconds else 0,
+                'last_batch': self._last_batch
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and let the worker drain the queue"""
+        self._running = False
+        if self._worker is not None:
+            self._queue.put(None)
+            if wait:
+                self._worker.join()
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark emotion classifier backends")
+    parser.add_argument('--backends', nargs='+', default=list(EMOTION_BACKENDS), choices=EMOTION_BACKENDS)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    sample_texts = [
+        "I can't believe how well the presentation went today!",
+        "I'm really worried about the exam tomorrow.",
+        "Why does this keep breaking every single time?",
+        "Play some relaxing music please.",
+        "That movie was honestly disgusting.",
+        "Oh wow, I didn't expect that at all.",
+        "I miss my old friends from school.",
+        "What's the weather in Paris tomorrow?"
+    ]
+    print(json.dumps(benchmark_backends(args.backends, sample_texts, args.repeats, args.threads), indent=2))
@@ -0,0 +1,114 @@
+#event_bus.py
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+
+
+class Subscription:
+    def __init__(self, max_queue: int):
+        """A single client's bounded queue of pending events."""
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+        self.closed = False
+
+
+class EventBus:
+    def __init__(self, replay_size: int = 200, subscriber_queue_size: int = 100,
+                 heartbeat_seconds: float = 15.0, retry_ms: int = 2000):
+        """
+        In-process publish/subscribe hub that fans events out to Server-Sent Events clients.
+
+        Every event gets a monotonically increasing id and is kept in a replay
+        buffer, so a client that reconnects with Last-Event-ID receives what it
+        missed. Each subscriber has a bounded queue; a client that falls that far
+        behind is disconnected rather than letting memory grow, and its browser
+        reconnects and catches up from the replay buffer.
+
+        Args:
+            replay_size: Number of recent events kept for reconnecting clients
+            subscriber_queue_size: Pending events allowed per client before it is dropped
+            heartbeat_seconds: Idle interval after which a keep-alive comment is sent
+            retry_ms: Reconnect delay suggested to the browser
+        """
+        self.replay_size = replay_size
+        self.subscriber_queue_size = subscriber_queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retry_ms = retry_ms
+        self._ids = itertools.count(1)
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._published = 0
+        self._dropped_clients = 0
+
+    def publish(self, event_type: str, data: Any) -> int:
+        """
+        Send an event to every connected client.
+
+        Returns:
+            The id assigned to the event
+        """
+        with self._lock:
+            event_id = next(self._ids)
+            event = (event_id, event_type, json.dumps(data, default=str))
+            self._replay.append(event)
+            self._published += 1
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription.overflowed = True
+                    self._subscribers.discard(subscription)
+                    self._dropped_clients += 1
+            return event_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """Register a client, pre-filled with any replayable events after last_event_id"""
+        subscription = Subscription(self.subscriber_queue_size + self.replay_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._replay:
+                    if event[0] > last_event_id:
+                        subscription.queue.put_nowait(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.closed = True
+
+    @staticmethod
+    def format_event(event_id: int, event_type: str, payload: str) -> str:
+        return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+    def stream(self, last_event_id: Optional[int] = None) -> Iterator[str]:
+        """Generator of SSE-formatted chunks for one client connection"""
+        subscription = self.subscribe(last_event_id)
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while not subscription.closed:
+                try:
+                    event = subscription.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    if subscription.overflowed:
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self.format_event(*event)
+                if subscription.overflowed and subscription.queue.empty():
+                    break
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published,
+                'dropped_clients': self._dropped_clients,
+                'replay_buffered': len(self._replay)
+            }
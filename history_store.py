@@ -0,0 +1,193 @@
+#history_store.py
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _Partition:
+    def __init__(self, capacity: int):
+        """Fixed-size ring buffer of records stored column by column."""
+        self.capacity = capacity
+        self.seqs = [0] * capacity
+        self.times = [0.0] * capacity
+        self.labels: List[Optional[str]] = [None] * capacity
+        self.records: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.start = 0
+        self.size = 0
+        self.label_index: Dict[str, deque] = {}
+
+    def _slot(self, i: int) -> int:
+        return (self.start + i) % self.capacity
+
+    def append(self, seq: int, created_at: float, label: Optional[str], record: Dict[str, Any]):
+        if self.size == self.capacity:
+            old_label = self.labels[self.start]
+            if old_label is not None:
+                # Records leave in insertion order, so the evicted seq is always
+                # the oldest entry in its label's index.
+                index = self.label_index[old_label]
+                index.popleft()
+                if not index:
+                    del self.label_index[old_label]
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        else:
+            slot = self._slot(self.size)
+            self.size += 1
+
+        self.seqs[slot] = seq
+        self.times[slot] = created_at
+        self.labels[slot] = label
+        self.records[slot] = record
+        if label is not None:
+            self.label_index.setdefault(label, deque()).append(seq)
+
+    def _bisect(self, column: List, value, right: bool = False) -> int:
+        """Binary search over the logical (oldest-first) order of a column."""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            item = column[self._slot(mid)]
+            if item < value or (right and item == value):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def positions(self, after_seq: Optional[int], start_time: Optional[float],
+                  end_time: Optional[float], label: Optional[str]) -> List[int]:
+        """Logical positions of matching records, oldest first."""
+        lo, hi = 0, self.size
+        if after_seq is not None:
+            lo = max(lo, self._bisect(self.seqs, after_seq, right=True))
+        if start_time is not None:
+            lo = max(lo, self._bisect(self.times, start_time))
+        if end_time is not None:
+            hi = min(hi, self._bisect(self.times, end_time, right=True))
+        if lo >= hi:
+            return []
+
+        if label is None:
+            return list(range(lo, hi))
+
+        seqs = self.label_index.get(label)
+        if not seqs:
+            return []
+        positions = []
+        for seq in seqs:
+            pos = self._bisect(self.seqs, seq)
+            if lo <= pos < hi:
+                positions.append(pos)
+        return positions
+
+
+class HistoryStore:
+    def __init__(self, capacity: int = 1000, label_key: Optional[str] = None,
+                 max_sessions: int = 100, id_key: Optional[str] = None):
+        """
+        Bounded, indexed history of records partitioned by session.
+
+        Each session keeps at most `capacity` records in a ring buffer, so memory
+        stays flat no matter how long the process runs. Records are indexed by
+        sequence number, creation time and (optionally) a label field, and can be
+        queried page by page instead of being serialized in full.
+
+        Args:
+            capacity: Maximum records kept per session
+            label_key: Record field to index for label filters (e.g. 'emotion')
+            max_sessions: Sessions beyond this are evicted, least recently used first
+            id_key: If set, each record gets its sequence number under this key
+        """
+        self.capacity = max(1, int(capacity))
+        self.label_key = label_key
+        self.max_sessions = max(1, int(max_sessions))
+        self.id_key = id_key
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any], session_id: str = 'default') -> int:
+        """
+        Add a record to a session's history.
+
+        Returns:
+            The record's sequence number (monotonically increasing across sessions)
+        """
+        label = record.get(self.label_key) if self.label_key else None
+        with self._lock:
+            partition = self._partitions.get(session_id)
+            if partition is None:
+                partition = _Partition(self.capacity)
+                self._partitions[session_id] = partition
+                while len(self._partitions) > self.max_sessions:
+                    self._partitions.popitem(last=False)
+            else:
+                self._partitions.move_to_end(session_id)
+
+            seq = next(self._seq)
+            self._last_seq = seq
+            if self.id_key:
+                record[self.id_key] = seq
+            partition.append(seq, time.time(), label, record)
+            return seq
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._partitions)
+
+    def query(self, session_id: Optional[str] = None, after_seq: Optional[int] = None,
+              start_time: Optional[float] = None, end_time: Optional[float] = None,
+              label: Optional[str] = None, offset: int = 0,
+              limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Return matching records in chronological order.
+
+        Pages are counted back from the newest match: offset=0 returns the most
+        recent `limit` records, offset=limit the page before that, and so on.
+
+        Args:
+            session_id: Restrict to one session (None searches all sessions)
+            after_seq: Only records with a sequence number greater than this
+            start_time / end_time: Inclusive epoch-seconds bounds on creation time
+            label: Only records whose indexed label equals this value
+            offset: Number of newest matches to skip
+            limit: Maximum number of records to return
+
+        Returns:
+            Tuple of (records, total number of matches before paging)
+        """
+        with self._lock:
+            if session_id is None:
+                partitions = list(self._partitions.values())
+            elif session_id in self._partitions:
+                partitions = [self._partitions[session_id]]
+            else:
+                return [], 0
+
+            matches = []
+            for partition in partitions:
+                for pos in partition.positions(after_seq, start_time, end_time, label):
+                    slot = partition._slot(pos)
+                    matches.append((partition.seqs[slot], partition.records[slot]))
+            if len(partitions) > 1:
+                matches.sort(key=lambda m: m[0])
+
+            total = len(matches)
+            end = total - max(0, offset)
+            begin = 0 if limit is None else max(0, end - limit)
+            return [record for _, record in matches[begin:max(0, end)]], total
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(p.size for p in self._partitions.values())
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
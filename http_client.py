@@ -0,0 +1,128 @@
+#http_client.py
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class EndpointMetrics:
+    def __init__(self):
+        """Request count, failures and latency for one named endpoint."""
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': round(self.total_seconds / self.requests * 1000, 2) if self.requests else 0,
+            'max_ms': round(self.max_seconds * 1000, 2)
+        }
+
+
+class HttpClient:
+    def __init__(self, timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT, retries: int = 3,
+                 backoff_factor: float = 0.3, pool_maxsize: int = 10, headers: Optional[Dict[str, str]] = None):
+        """
+        Pooled HTTP client shared by the services that call web APIs.
+
+        One requests.Session keeps connections (and TLS sessions) alive between
+        calls. Idempotent requests are retried with exponential backoff on
+        connection errors and 429/5xx responses (honouring Retry-After), every
+        call has a timeout, and latency is recorded per endpoint name.
+
+        Args:
+            timeout: Default timeout in seconds, or a (connect, read) tuple
+            retries: Retries after the first attempt
+            backoff_factor: Backoff base; waits are backoff_factor * 2^(retry - 1)
+            pool_maxsize: Connections kept open per host
+            headers: Headers sent with every request
+        """
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self._metrics: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, name: Optional[str] = None,
+            timeout: Union[None, float, Tuple[float, float]] = None) -> requests.Response:
+        """
+        GET a URL through the pooled session.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+            name: Endpoint name latency is recorded under (defaults to the URL)
+            timeout: Overrides the default timeout
+
+        Raises:
+            requests.RequestException on connection errors, timeouts and error statuses
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            failed = False
+            return response
+        finally:
+            self._record(name or url, time.perf_counter() - start, failed)
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, name: Optional[str] = None,
+                 timeout: Union[None, float, Tuple[float, float]] = None) -> Any:
+        return self.get(url, params=params, name=name, timeout=timeout).json()
+
+    def _record(self, name: str, seconds: float, failed: bool):
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = self._metrics[name] = EndpointMetrics()
+            metrics.requests += 1
+            metrics.total_seconds += seconds
+            metrics.max_seconds = max(metrics.max_seconds, seconds)
+            if failed:
+                metrics.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: metrics.snapshot() for name, metrics in self._metrics.items()}
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> HttpClient:
+    """The process-wide client, created on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
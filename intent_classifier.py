@@ -0,0 +1,331 @@
+#intent_classifier.py
+import hashlib
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from intent_router import IntentMatch
+
+INTENT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHAT_INTENT = 'chat'
+
+# Example utterances per intent; 'chat' covers everything that should go to the LLM
+PROTOTYPE_UTTERANCES = {
+    'code_generate': [
+        "write a python program that sorts a list",
+        "create a python script to rename files",
+        "generate code for a simple calculator",
+        "I need a program that downloads images from a website",
+        "make a script that converts csv to json",
+        "code a tic tac toe game in python",
+    ],
+    'code_edit': [
+        "edit the python code in main.py",
+        "fix the bug in utils.py",
+        "modify code in parser.py to handle empty lines",
+        "refactor the function in app.py",
+        "update the script to add logging",
+        "change the code in game.py so the player moves faster",
+    ],
+    'music': [
+        "play some music",
+        "play a song by the beatles",
+        "search youtube for relaxing piano music",
+        "find the song bohemian rhapsody",
+        "put on some jazz",
+        "I want to listen to taylor swift",
+    ],
+    'document_create': [
+        "write an essay about climate change",
+        "create a word document about the history of rome",
+        "write a report on quarterly sales",
+        "compose a letter to my landlord and save it",
+        "type up a text file with my shopping list",
+        "generate an article about electric cars",
+    ],
+    'document_edit': [
+        "edit notes.txt and make the title bold",
+        "update the document report.docx with the new figures",
+        "revise my essay.txt to be more formal",
+        "change the second paragraph of letter.docx",
+        "modify the text file todo.txt",
+    ],
+    'document_read': [
+        "read todo.txt",
+        "open the file meeting.docx",
+        "show me the contents of notes.txt",
+        "display report.docx",
+        "what does my essay.txt say",
+    ],
+    'weather': [
+        "what's the weather in london",
+        "will it rain tomorrow in paris",
+        "what's the temperature in tokyo",
+        "give me the forecast for new york",
+        "how hot is it in dubai today",
+        "is it going to be sunny this weekend in berlin",
+    ],
+    CHAT_INTENT: [
+        "how are you doing today",
+        "tell me a joke",
+        "I want to create a better morning routine, any tips",
+        "can you help me make a decision about my career",
+        "what do you think about this plan",
+        "explain how photosynthesis works",
+        "I'm feeling stressed about work",
+        "show me how to be more productive",
+        "what is the capital of australia",
+        "thanks, that was helpful",
+        "let's talk about movies",
+        "how do I change my sleeping habits",
+    ],
+}
+
+
+class TransformerSentenceEncoder:
+    def __init__(self, model_name: str = INTENT_EMBEDDING_MODEL, num_threads: Optional[int] = None):
+        """
+        Mean-pooled, L2-normalized sentence embeddings from a transformers encoder.
+
+        Args:
+            model_name: Hugging Face model id of a sentence embedding model
+            num_threads: Intra-op thread count for torch (None keeps the default)
+        """
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if num_threads:
+            torch.set_num_threads(int(num_threads))
+        self.name = model_name
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        torch = self._torch
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=64, return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        embeddings = pooled.numpy().astype(np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+class HashingSentenceEncoder:
+    def __init__(self, dimensions: int = 512, ngram: int = 3):
+        """
+        Dependency-free encoder hashing word and character n-grams into a fixed
+        vector. Much weaker than a trained model; used offline and in benchmarks.
+        """
+        self.name = f"hashing-{dimensions}-{ngram}"
+        self.dimensions = dimensions
+        self.ngram = ngram
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            features = list(words)
+            for word in words:
+                padded = f" {word} "
+                features.extend(padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1))
+            for feature in features:
+                embeddings[row, zlib.crc32(feature.encode('utf-8')) % self.dimensions] += 1.0
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+class EmbeddingIntentClassifier:
+    def __init__(self, encoder, prototypes: Dict[str, List[str]] = PROTOTYPE_UTTERANCES,
+                 cache_dir: Optional[str] = 'models'):
+        """
+        Nearest-prototype intent classifier over sentence embeddings.
+
+        Prototype utterances are embedded once and stacked into one matrix (cached
+        on disk by encoder and prototype text, so restarts skip the encoding). Each
+        utterance then costs one encoder call and one matrix-vector product; an
+        intent's score is its best prototype's cosine similarity.
+
+        Args:
+            encoder: Object with `name` and encode(texts) -> normalized (n, d) array
+            prototypes: Example utterances per intent
+            cache_dir: Where prototype embeddings are cached (None disables the cache)
+        """
+        self.encoder = encoder
+        self.intents = list(prototypes)
+        texts = []
+        self._starts = []
+        for intent in self.intents:
+            self._starts.append(len(texts))
+            texts.extend(prototypes[intent])
+        self._starts = np.array(self._starts)
+        self.prototype_count = len(texts)
+
+        start = time.perf_counter()
+        self.matrix, self.loaded_from_cache = self._load_matrix(texts, cache_dir)
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        self.calls = 0
+        self.total_seconds = 0.0
+
+    def _load_matrix(self, texts: List[str], cache_dir: Optional[str]) -> Tuple[np.ndarray, bool]:
+        path = None
+        if cache_dir:
+            key = hashlib.sha256(json.dumps([self.encoder.name, texts]).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(cache_dir, f"intent_prototypes_{key}.npy")
+            if os.path.exists(path):
+                return np.load(path), True
+
+        matrix = np.ascontiguousarray(self.encoder.encode(texts), dtype=np.float32)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(path, matrix)
+        return matrix, False
+
+    def scores(self, text: str) -> np.ndarray:
+        """Best-prototype cosine similarity for every intent, in self.intents order"""
+        start = time.perf_counter()
+        vector = self.encoder.encode([text])[0]
+        similarities = self.matrix @ vector
+        scores = np.maximum.reduceat(similarities, self._starts)
+        self.calls += 1
+        self.total_seconds += time.perf_counter() - start
+        return scores
+
+    def classify(self, text: str) -> Tuple[str, float, float]:
+        """
+        Returns:
+            Tuple of (intent, score, margin over the runner-up intent)
+        """
+        scores = self.scores(text)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+        return self.intents[order[0]], best, best - runner_up
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'encoder': self.encoder.name,
+            'intents': len(self.intents),
+            'prototypes': self.prototype_count,
+            'prototypes_cached': self.loaded_from_cache,
+            'build_seconds': self.build_seconds,
+            'calls': self.calls,
+            'avg_ms': round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0
+        }
+
+
+class HybridIntentRouter:
+    def __init__(self, keyword_router, classifier: EmbeddingIntentClassifier,
+                 threshold: float = 0.55, min_margin: float = 0.03):
+        """
+        Route with the embedding classifier when it is confident, and with the
+        keyword rules otherwise. A confident 'chat' result routes nowhere, so the
+        text goes to the LLM instead of a handler that merely shares a keyword.
+
+        Args:
+            keyword_router: IntentRouter used below the confidence threshold
+            classifier: EmbeddingIntentClassifier
+            threshold: Lowest best-prototype similarity that is trusted
+            min_margin: Lowest lead over the runner-up intent that is trusted
+        """
+        self.keyword_router = keyword_router
+        self.classifier = classifier
+        self.threshold = threshold
+        self.min_margin = min_margin
+        self.rules = {}
+        for rule in keyword_router.rules:
+            self.rules.setdefault(rule.name, rule)
+        self.embedding_routed = 0
+        self.keyword_fallbacks = 0
+
+    def route(self, text: str) -> List[IntentMatch]:
+        try:
+            intent, score, margin = self.classifier.classify(text)
+        except Exception as e:
+            print(f"Error classifying intent, using keyword rules: {str(e)}")
+            intent, score, margin = None, 0.0, 0.0
+
+        if score >= self.threshold and margin >= self.min_margin:
+            self.embedding_routed += 1
+            if intent == CHAT_INTENT or intent not in self.rules:
+                return []
+            return [IntentMatch(intent, 0, text, self.rules[intent], score=round(score, 3), source='embedding')]
+
+        self.keyword_fallbacks += 1
+        return self.keyword_router.route(text)
+
+    def best(self, text: str) -> Optional[IntentMatch]:
+        matches = self.route(text)
+        return matches[0] if matches else None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.classifier.stats()
+        stats.update({
+            'threshold': self.threshold,
+            'embedding_routed': self.embedding_routed,
+            'keyword_fallbacks': self.keyword_fallbacks
+        })
+        return stats
+
+
+# (utterance, expected intent) pairs, including ones the keyword rules get wrong
+LABELLED_UTTERANCES = [
+    ("Can you write a python program that sorts a list of numbers", 'code_generate'),
+    ("Fix code in parser.py so it handles empty lines", 'code_edit'),
+    ("Play some relaxing music", 'music'),
+    ("Search youtube for the latest lofi mix", 'music'),
+    ("Write an essay about renewable energy", 'document_create'),
+    ("Compose a letter to my landlord", 'document_create'),
+    ("Read todo.txt", 'document_read'),
+    ("What's the weather in London", 'weather'),
+    ("Give me the forecast for Tokyo", 'weather'),
+    ("How are you doing today", CHAT_INTENT),
+    ("I want to create a healthier diet plan, what should I eat", CHAT_INTENT),
+    ("Can you make me feel better, I had a rough day", CHAT_INTENT),
+    ("Show me how to stay motivated", CHAT_INTENT),
+    ("How do I change my habits", CHAT_INTENT),
+    ("Let's talk about the movie I saw yesterday", CHAT_INTENT),
+    ("Why do people find it hard to open up", CHAT_INTENT),
+]
+
+
+def evaluate(router, labelled: List[Tuple[str, str]] = LABELLED_UTTERANCES) -> Dict[str, Any]:
+    correct = 0
+    mistakes = []
+    start = time.perf_counter()
+    for text, expected in labelled:
+        best = router.best(text)
+        routed = best.name if best else CHAT_INTENT
+        if routed == expected:
+            correct += 1
+        else:
+            mistakes.append({'text': text, 'expected': expected, 'routed': routed})
+    return {
+        'accuracy': round(correct / len(labelled), 3),
+        'avg_ms': round((time.perf_counter() - start) / len(labelled) * 1000, 3),
+        'mistakes': mistakes
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from intent_router import IntentRouter, default_rules
+
+    parser = argparse.ArgumentParser(description="Compare keyword and embedding intent routing on labelled utterances")
+    parser.add_argument('--encoder', choices=['transformer', 'hashing'], default='transformer')
+    parser.add_argument('--model', default=INTENT_EMBEDDING_MODEL)
+    parser.add_argument('--threshold', type=float, default=0.55)
+    args = parser.parse_args()
+
+    keyword_router = IntentRouter(default_rules())
+    encoder = TransformerSentenceEncoder(args.model) if args.encoder == 'transformer' else HashingSentenceEncoder()
+    hybrid = HybridIntentRouter(keyword_router, EmbeddingIntentClassifier(encoder), threshold=args.threshold)
+    report = {'keywords': evaluate(keyword_router), 'embedding': evaluate(hybrid)}
+    report['embedding'].update(hybrid.stats())
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,290 @@
+#intent_router.py
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DOCUMENT_KEYWORDS = {
+    'create': ['type', 'write', 'create', 'make', 'generate', 'compose'],
+    'edit': ['edit', 'modify', 'change', 'update', 'revise'],
+    'read': ['read', 'show', 'display', 'open', 'view']
+}
+MUSIC_VERBS = ['play', 'find', 'search']
+MUSIC_NOUNS = ['song', 'music', 'youtube']
+# Removed from a music request to leave the search query
+MUSIC_FILLER_WORDS = ['play', 'find', 'search', 'for', 'song', 'music', 'youtube', 'on', 'please', 'can', 'you']
+WEATHER_KEYWORDS = ['weather', 'temperature', 'forecast']
+
+_MUSIC_FILLER_RE = re.compile(r'\b(?:' + '|'.join(MUSIC_FILLER_WORDS) + r')\b')
+
+
+class IntentRule:
+    def __init__(self, name: str, groups: List[List[str]], extract: Optional[Callable[[str], Dict[str, Any]]] = None):
+        """
+        An intent that matches when the text contains at least one phrase from
+        every group (substring match on the lowercased text).
+
+        Args:
+            name: Intent name; several rules may share one (e.g. a fallback rule)
+            groups: Phrase groups that must all be present
+            extract: Builds the intent's slots from the original text
+        """
+        self.name = name
+        self.groups = groups
+        self.extract = extract
+
+
+class IntentMatch:
+    def __init__(self, name: str, rank: int, text: str, rule: Optional[IntentRule] = None,
+                 score: float = 1.0, source: str = 'keywords'):
+        """A routed intent. Slots are extracted on first access, so only the handled intent pays for them."""
+        self.name = name
+        self.rank = rank
+        self.score = score
+        self.source = source
+        self.text = text
+        self._rule = rule
+        self._slots = None
+
+    @property
+    def slots(self) -> Dict[str, Any]:
+        if self._slots is None:
+            extract = self._rule.extract if self._rule else None
+            self._slots = extract(self.text) if extract else {}
+        return self._slots
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'intent': self.name, 'rank': self.rank, 'score': self.score, 'source': self.source, 'slots': self.slots}
+
+
+def _trie_pattern(phrases) -> str:
+    """
+    Regex for a set of phrases built from their character trie, so branches share
+    prefixes and the longest phrase at a position is tried first.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if '' in node else body
+
+    return build(trie)
+
+
+class IntentRouter:
+    def __init__(self, rules: List[IntentRule]):
+        """
+        Route an utterance to ranked intents in a single scan.
+
+        Every trigger phrase of every rule is compiled into one trie-shaped regex.
+        Wrapped in a lookahead, it reports the longest phrase starting at each
+        position of the text; each phrase is precomputed to also stand for the
+        shorter phrases it starts with, so overlapping matches are not lost.
+        Rules are ranked in the order given.
+
+        Args:
+            rules: Intent rules in priority order
+        """
+        self.rules = rules
+        # Each (rule, group) pair is one bit; a phrase's mask marks every group it
+        # satisfies, and a rule matches when all of its group bits are set.
+        masks: Dict[str, int] = {}
+        self._rule_masks = []
+        bit = 0
+        for rule in rules:
+            rule_mask = 0
+            for group in rule.groups:
+                for phrase in group:
+                    masks[phrase] = masks.get(phrase, 0) | (1 << bit)
+                rule_mask |= 1 << bit
+                bit += 1
+            self._rule_masks.append(rule_mask)
+
+        self._masks = {}
+        for phrase in masks:
+            mask = 0
+            for prefix, prefix_mask in masks.items():
+                if phrase.startswith(prefix):
+                    mask |= prefix_mask
+            self._masks[phrase] = mask
+        self._resolved: Dict[int, List[IntentRule]] = {}
+        self._pattern = re.compile('(?=(' + _trie_pattern(masks) + '))')
+
+    def matched_phrases(self, text: str) -> List[str]:
+        return self._pattern.findall(text.lower())
+
+    def route(self, text: str) -> List[IntentMatch]:
+        """
+        Returns:
+            Matching intents, highest priority first; empty if nothing matched
+        """
+        hits = 0
+        masks = self._masks
+        for phrase in self._pattern.findall(text.lower()):
+            hits |= masks[phrase]
+        if not hits:
+            return []
+
+        rules = self._resolved.get(hits)
+        if rules is None:
+            rules = []
+            seen = set()
+            for rule, rule_mask in zip(self.rules, self._rule_masks):
+                if hits & rule_mask == rule_mask and rule.name not in seen:
+                    seen.add(rule.name)
+                    rules.append(rule)
+            self._resolved[hits] = rules
+        return [IntentMatch(rule.name, rank, text, rule) for rank, rule in enumerate(rules)]
+
+    def best(self, text: str) -> Optional[IntentMatch]:
+        matches = self.route(text)
+        return matches[0] if matches else None
+
+
+def music_slots(text: str) -> Dict[str, Any]:
+    query = _MUSIC_FILLER_RE.sub(' ', text.lower())
+    return {'query': ' '.join(query.split())}
+
+
+def document_read_slots(text: str) -> Dict[str, Any]:
+    for word in text.split():
+        if word.endswith('.txt') or word.endswith('.docx'):
+            return {'filename': word}
+    return {'filename': None}
+
+
+def default_rules(code_phrases: Optional[Dict[str, List[str]]] = None,
+                  document_keywords: Optional[Dict[str, List[str]]] = None) -> List[IntentRule]:
+    """
+    The assistant's command intents, in the order the handlers used to be tried:
+    code, music, document (create, edit, read), weather.
+    """
+    from code_service import CODE_PHRASES, CODE_GENERIC_WORDS, build_edit_request, build_generate_request, build_generic_request
+
+    code_phrases = code_phrases or CODE_PHRASES
+    document_keywords = document_keywords or DOCUMENT_KEYWORDS
+    return [
+        IntentRule('code_generate', [code_phrases['generate']], build_generate_request),
+        IntentRule('code_edit', [code_phrases['edit']], build_edit_request),
+        IntentRule('code_generate', [CODE_GENERIC_WORDS[:1], CODE_GENERIC_WORDS[1:]], build_generic_request),
+        IntentRule('music', [MUSIC_VERBS, MUSIC_NOUNS], music_slots),
+        IntentRule('document_create', [document_keywords['create']]),
+        IntentRule('document_edit', [document_keywords['edit']]),
+        IntentRule('document_read', [document_keywords['read']], document_read_slots),
+        IntentRule('weather', [WEATHER_KEYWORDS])
+    ]
+
+
+def legacy_route(text: str, code_phrases: Dict[str, List[str]], document_keywords: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
+    """The original chain of substring scans, kept for benchmark comparisons."""
+    document_keywords = document_keywords or DOCUMENT_KEYWORDS
+    text_lower = text.lower()
+    for phrase in code_phrases['generate']:
+        if phrase in text_lower:
+            return 'code_generate'
+    for phrase in code_phrases['edit']:
+        if phrase in text_lower:
+            return 'code_edit'
+    if 'python' in text_lower and ('program' in text_lower or 'code' in text_lower or 'script' in text_lower):
+        return 'code_generate'
+    if (('play' in text_lower or 'find' in text_lower or 'search' in text_lower) and
+            ('song' in text_lower or 'music' in text_lower or 'youtube' in text_lower)):
+        return 'music'
+    if any(keyword in text_lower for keyword in document_keywords['create']):
+        return 'document_create'
+    if any(keyword in text_lower for keyword in document_keywords['edit']):
+        return 'document_edit'
+    if any(keyword in text_lower for keyword in document_keywords['read']):
+        return 'document_read'
+    if any(word in text_lower for word in WEATHER_KEYWORDS):
+        return 'weather'
+    return None
+
+
+SAMPLE_UTTERANCES = [
+    "Can you write a python program that sorts a list of numbers",
+    "Create code for a simple calculator",
+    "Please edit the python code in file utils.py to add logging",
+    "Fix code in parser.py so it handles empty lines",
+    "I want a python script to rename my photos",
+    "Play some relaxing music",
+    "Search youtube for the latest lofi mix",
+    "Find the song bohemian rhapsody",
+    "Write an essay about renewable energy",
+    "Create a report on the quarterly sales numbers",
+    "Compose a letter to my landlord",
+    "Edit notes.txt and make the title bold",
+    "Open the file meeting.docx",
+    "Read todo.txt",
+    "What's the weather in London",
+    "What will the temperature be in Paris tomorrow",
+    "Give me the forecast for Tokyo the day after tomorrow",
+    "How are you doing today",
+    "Tell me a joke about cats",
+    "I'm feeling a bit down, can we talk",
+    "What is the capital of Australia",
+    "Explain how photosynthesis works",
+    "Why is the sky blue",
+    "Remind me what we talked about earlier",
+    "Thanks, that was really helpful",
+    "Can you recommend a good book on history",
+    "What's your favourite movie",
+    "I just got back from a long walk and I'm exhausted",
+]
+
+
+def benchmark(utterances: List[str], repeat: int = 200) -> Dict[str, Any]:
+    """Compare the legacy scan chain with the compiled router: per-utterance cost and top-intent agreement."""
+    from code_service import CODE_PHRASES
+
+    router = IntentRouter(default_rules())
+    results = {'utterances': len(utterances), 'repeat': repeat}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in utterances:
+            legacy_route(text, CODE_PHRASES)
+    results['legacy_us'] = round((time.perf_counter() - start) / (repeat * len(utterances)) * 1e6, 2)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in utterances:
+            router.best(text)
+    results['router_us'] = round((time.perf_counter() - start) / (repeat * len(utterances)) * 1e6, 2)
+
+    disagreements = []
+    for text in utterances:
+        best = router.best(text)
+        routed = best.name if best else None
+        legacy = legacy_route(text, CODE_PHRASES)
+        if routed != legacy:
+            disagreements.append({'text': text, 'legacy': legacy, 'router': routed})
+    results['agreement'] = round(1 - len(disagreements) / max(1, len(utterances)), 3)
+    results['disagreements'] = disagreements
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Micro-benchmark intent routing over a corpus of utterances")
+    parser.add_argument('corpus', nargs='?', help="Text file with one utterance per line (defaults to a built-in sample)")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            utterances = [line.strip() for line in f if line.strip()]
+    else:
+        utterances = SAMPLE_UTTERANCES
+    print(json.dumps(benchmark(utterances, args.repeat), indent=2))
@@ -0,0 +1,312 @@
+#llm_client.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from cache_utils import MISSING, SQLiteCache, TTLCache
+from llm_dispatch import LLMDispatcher, estimate_tokens
+from streaming_response import MIN_SENTENCE_CHARS, FakeStreamingClient, StreamingResponse
+
+LLM_CACHE_PATH = os.path.join('cache', 'llm.sqlite3')
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 5000
+LLM_MEMORY_CACHE_SIZE = 256
+
+
+def _digest_part(part: Any) -> Any:
+    """JSON-friendly stand-in for one piece of a prompt; images and bytes are hashed"""
+    if part is None or isinstance(part, (str, int, float, bool)):
+        return part
+    if isinstance(part, (bytes, bytearray)):
+        return {'sha256': hashlib.sha256(part).hexdigest()}
+    if isinstance(part, dict):
+        return {str(k): _digest_part(v) for k, v in part.items()}
+    if isinstance(part, (list, tuple)):
+        return [_digest_part(p) for p in part]
+    if hasattr(part, 'tobytes') and hasattr(part, 'size') and hasattr(part, 'mode'):
+        # PIL image
+        return {'image': hashlib.sha256(part.tobytes()).hexdigest(), 'size': list(part.size), 'mode': part.mode}
+    return repr(part)
+
+
+def make_cache_key(provider: str, model: str, prompt: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    """sha256 of the provider, model, prompt (messages or contents) and generation parameters"""
+    payload = {
+        'provider': provider,
+        'model': model,
+        'prompt': _digest_part(prompt),
+        'params': _digest_part(params or {})
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, ttl: Optional[float] = LLM_CACHE_TTL,
+                 max_entries: Optional[int] = LLM_CACHE_MAX_ENTRIES, memory_size: int = LLM_MEMORY_CACHE_SIZE):
+        """
+        Two-tier store for LLM response text: an in-memory LRU in front of a
+        SQLite file, both expiring entries after `ttl` seconds. Disk hits are
+        promoted to memory.
+
+        Args:
+            path: SQLite file for the disk tier (None keeps responses in memory only,
+                as does a file that can't be opened, e.g. on a read-only filesystem)
+            ttl: Seconds a response stays valid (None never expires)
+            max_entries: Responses kept on disk before the least recently used are deleted
+            memory_size: Responses kept in memory
+        """
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self.disk = None
+        if path:
+            try:
+                self.disk = SQLiteCache(path, table='llm_responses', ttl=ttl, max_entries=max_entries)
+            except (OSError, sqlite3.Error) as e:
+                print(f"LLM response cache at {path} unavailable, caching in memory only: {str(e)}")
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is MISSING and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """
+        Args:
+            ttl: Seconds this entry stays valid, instead of the cache's TTL. Such
+                short-lived entries are kept in memory only.
+        """
+        self.memory.set(key, value, ttl)
+        if self.disk is not None and ttl is None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None
+        }
+
+
+def openai_usage(response) -> tuple:
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None)
+
+
+def gemini_usage(response) -> tuple:
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None)
+
+
+class DispatchedStreamingResponse(StreamingResponse):
+    def __init__(self, dispatcher: LLMDispatcher, client, min_chars: int = MIN_SENTENCE_CHARS, **params):
+        """
+        StreamingResponse opened through the dispatcher: opening the stream is
+        retried until its first chunk arrives, one of the OpenAI slots is held
+        until the stream ends, and the token usage reported in the final chunk
+        is recorded.
+        """
+        params.setdefault('stream_options', {'include_usage': True})
+        super().__init__(client, min_chars=min_chars, **params)
+        self.dispatcher = dispatcher
+
+    def _chunks(self) -> Iterator[Any]:
+        return self.dispatcher.stream(
+            'openai', self.params.get('model'),
+            lambda timeout: self.client.chat.completions.create(stream=True, timeout=timeout, **self.params),
+            estimated_tokens=estimate_tokens(self.params.get('messages'), self.params.get('max_tokens')),
+            usage=openai_usage
+        )
+
+
+class LLMClient:
+    def __init__(self, openai_client=None, cache: Optional[LLMResponseCache] = None,
+                 openai_factory: Optional[Callable[[], Any]] = None, dispatcher: Optional[LLMDispatcher] = None):
+        """
+        Single entry point for the chat (OpenAI) and generate_content (Gemini)
+        calls made by the services.
+
+        Responses are cached by content: the key hashes the model, the messages
+        or contents (images by their pixels) and the generation parameters, so
+        an identical request is answered from the cache without an API call.
+        Pass bypass=True to skip the cache entirely (e.g. for requests whose
+        answer should differ each time), or cache_ttl to keep a response only
+        briefly, in memory. Requests that reach a provider are scheduled by `dispatcher`
+        (concurrency and rate limits, timeouts, retries).
+
+        Args:
+            openai_client: OpenAI-compatible client used by chat()
+            cache: Response cache (None disables caching)
+            openai_factory: Builds the client on the first chat() instead, so
+                Gemini-only callers never construct it
+            dispatcher: LLMDispatcher shared by all callers (defaults to one with default limits)
+        """
+        self._openai_client = openai_client
+        self._openai_factory = openai_factory
+        self.cache = cache
+        self.dispatcher = dispatcher or LLMDispatcher()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.call_seconds = 0.0
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None and self._openai_factory is not None:
+            self._openai_client = self._openai_factory()
+        return self._openai_client
+
+    def _cached_call(self, key: Optional[str], call, bypass: bool, cache_ttl: Optional[float] = None) -> str:
+        if bypass:
+            key = None
+        if key is not None:
+            text = self.cache.get(key)
+            if text is not MISSING:
+                with self._lock:
+                    self.hits += 1
+                return text
+
+        start = time.perf_counter()
+        text = call()
+        with self._lock:
+            self.calls += 1
+            self.call_seconds += time.perf_counter() - start
+            if bypass:
+                self.bypassed += 1
+            elif key is not None:
+                self.misses += 1
+        if key is not None:
+            self.cache.set(key, text, cache_ttl)
+        return text
+
+    def chat_key(self, model: str, messages: List[Dict[str, Any]], **params) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return make_cache_key('openai', model, messages, params)
+
+    def chat(self, model: str, messages: List[Dict[str, Any]], bypass: bool = False,
+             cache_ttl: Optional[float] = None, **params) -> str:
+        """
+        Chat completion text for `messages`.
+
+        Args:
+            model: Model name
+            messages: Chat messages
+            bypass: Neither read nor write the cache
+            cache_ttl: Keep the response this many seconds, in memory only
+            **params: Other arguments for chat.completions.create (not stream)
+
+        Raises:
+            Whatever the client raised
+        """
+        def call():
+            response = self.dispatcher.run(
+                'openai', model,
+                lambda timeout: self.openai_client.chat.completions.create(
+                    model=model, messages=messages, timeout=timeout, **params),
+                estimated_tokens=estimate_tokens(messages, params.get('max_tokens')),
+                usage=openai_usage
+            )
+            return response.choices[0].message.content or ''
+
+        return self._cached_call(self.chat_key(model, messages, **params), call, bypass, cache_ttl)
+
+    def cached_chat(self, model: str, messages: List[Dict[str, Any]], **params) -> Optional[str]:
+        """Cached reply for a chat request, or None; used by callers that stream on a miss"""
+        key = self.chat_key(model, messages, **params)
+        if key is None:
+            return None
+        text = self.cache.get(key)
+        if text is MISSING:
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def stream_chat(self, model: str, messages: List[Dict[str, Any]], min_chars: int = MIN_SENTENCE_CHARS,
+                    **params) -> StreamingResponse:
+        """Streamed chat completion, iterated sentence by sentence (not cached; see store_chat)"""
+        return DispatchedStreamingResponse(self.dispatcher, self.openai_client, min_chars,
+                                           model=model, messages=messages, **params)
+
+    def store_chat(self, model: str, messages: List[Dict[str, Any]], text: str,
+                   cache_ttl: Optional[float] = None, **params):
+        """Cache a reply that was produced outside chat(), e.g. by streaming"""
+        key = self.chat_key(model, messages, **params)
+        if key is None or not text:
+            return
+        with self._lock:
+            self.misses += 1
+        self.cache.set(key, text, cache_ttl)
+
+    def generate(self, model, contents: Any, bypass: bool = False, **params) -> str:
+        """
+        Text of model.generate_content(contents) for a Gemini GenerativeModel.
+
+        Args:
+            model: GenerativeModel (or FakeLLMProvider)
+            contents: Prompt string or list of parts (text and PIL images)
+            bypass: Neither read nor write the cache
+            **params: Other arguments for generate_content
+
+        Raises:
+            Whatever the model raised
+        """
+        model_name = getattr(model, 'model_name', repr(model))
+        key = make_cache_key('gemini', model_name, contents, params) if self.cache is not None else None
+
+        def call():
+            return self.dispatcher.run(
+                'gemini', model_name,
+                lambda timeout: model.generate_content(contents, request_options={'timeout': timeout}, **params),
+                estimated_tokens=estimate_tokens(contents),
+                usage=gemini_usage
+            ).text
+
+        return self._cached_call(key, call, bypass)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_call = self.call_seconds / self.calls if self.calls else 0
+            stats = {
+                'calls': self.calls,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'avg_call_ms': round(avg_call * 1000, 2),
+                # Rough: each hit saved an average-length call
+                'seconds_saved': round(self.hits * avg_call, 2)
+            }
+        stats['cache'] = self.cache.stats() if self.cache is not None else None
+        stats['dispatch'] = self.dispatcher.stats()
+        return stats
+
+
+class FakeLLMProvider(FakeStreamingClient):
+    def __init__(self, responses: Iterable[str] = ("This is a canned reply. It arrives in small pieces!",),
+                 chunk_size: int = 4, delay: float = 0.0, model_name: str = 'fake'):
+        """
+        Offline stand-in for both providers: the OpenAI chat completions API
+        (see FakeStreamingClient) and a Gemini GenerativeModel's generate_content.
+        Every call, from either API, is recorded in .calls.
+        """
+        super().__init__(responses, chunk_size=chunk_size, delay=delay)
+        self.model_name = model_name
+
+    def generate_content(self, contents: Any, **params):
+        self.calls.append({'model': self.model_name, 'contents': contents, **params})
+        if self.delay:
+            time.sleep(self.delay)
+        text = self._next_response()
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(contents, 0),
+                                candidates_token_count=estimate_tokens(text, 0))
+        return SimpleNamespace(text=text, usage_metadata=usage)
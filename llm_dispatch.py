@@ -0,0 +1,348 @@
+#llm_dispatch.py
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Transient failures that carry no status code (OpenAI and Google client exceptions)
+RETRY_ERROR_NAMES = {'APITimeoutError', 'APIConnectionError', 'DeadlineExceeded', 'ServiceUnavailable',
+                     'ResourceExhausted', 'InternalServerError', 'TimeoutError', 'ConnectionError'}
+# Rough prompt tokens per character, and per image part for Gemini
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def estimate_tokens(prompt: Any, max_tokens: Optional[int] = None) -> int:
+    """Rough token count of a request (prompt plus expected completion), used to reserve TPM budget"""
+    def count(part):
+        if isinstance(part, str):
+            return len(part) // CHARS_PER_TOKEN + 1
+        if isinstance(part, dict):
+            return sum(count(v) for v in part.values())
+        if isinstance(part, (list, tuple)):
+            return sum(count(p) for p in part)
+        return IMAGE_TOKENS
+
+    return count(prompt) + (DEFAULT_COMPLETION_TOKENS if max_tokens is None else max_tokens)
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of an OpenAI (status_code) or Google API (code) error, if it has one"""
+    for attr in ('status_code', 'code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    return error_status(error) in RETRY_STATUSES or type(error).__name__ in RETRY_ERROR_NAMES
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header on the error's response"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Rate limiter refilled continuously at `per_minute` units per minute, holding
+        at most a minute's worth. Callers reserve units up front and are told how
+        long to wait, so waiting callers are served in the order they arrived.
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` (possibly into debt) and return the seconds to wait before using it"""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) the difference once the real usage is known"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ProviderLimits:
+    def __init__(self, max_concurrency: int = 4, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 timeout: float = 60.0, max_retries: int = 3):
+        """
+        Limits for one LLM provider.
+
+        Args:
+            max_concurrency: Requests in flight at once; further callers queue
+            rpm: Requests per minute (None is unlimited)
+            tpm: Tokens per minute (None is unlimited)
+            timeout: Seconds each attempt may take
+            max_retries: Retries after the first attempt on 429/5xx and timeouts
+        """
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+
+class ModelMetrics:
+    def __init__(self):
+        """Request, retry, token and latency counts for one provider/model pair."""
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'throttled_seconds': round(self.throttled_seconds, 3),
+            'avg_ms': round(self.total_seconds / self.requests * 1000, 2) if self.requests else 0,
+            'max_ms': round(self.max_seconds * 1000, 2),
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens
+        }
+
+
+class _Provider:
+    def __init__(self, limits: ProviderLimits):
+        self.limits = limits
+        self.slots = threading.BoundedSemaphore(limits.max_concurrency)
+        self.requests = TokenBucket(limits.rpm) if limits.rpm else None
+        self.tokens = TokenBucket(limits.tpm) if limits.tpm else None
+        self.in_flight = 0
+        self.waiting = 0
+
+
+class LLMDispatcher:
+    def __init__(self, limits: Optional[Dict[str, ProviderLimits]] = None, backoff_base: float = 0.5,
+                 backoff_max: float = 20.0, sleep: Callable[[float], None] = time.sleep, metrics=None):
+        """
+        Schedules every LLM request: each provider ('openai', 'gemini') gets a
+        bounded number of concurrent requests and optional token buckets for its
+        requests-per-minute and tokens-per-minute limits, so bursts from several
+        users queue here instead of tripping the API's rate limits. Requests
+        that fail with 429/5xx or time out are retried with full-jitter
+        exponential backoff (or the server's Retry-After). Latency, retries and
+        token usage are recorded per provider and model.
+
+        Args:
+            limits: ProviderLimits per provider name; unknown providers get the defaults
+            backoff_base: First retry waits up to this many seconds, doubling each retry
+            backoff_max: Longest wait between retries
+            sleep: Sleep function, replaceable in tests
+            metrics: MetricsRegistry the request latencies, tokens and retries are exported to
+        """
+        self._limits = dict(limits or {})
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self._providers: Dict[str, _Provider] = {}
+        self._metrics: Dict[Tuple[str, str], ModelMetrics] = {}
+        self._lock = threading.Lock()
+        self._request_seconds = self._token_counter = self._retry_counter = None
+        if metrics is not None:
+            self._request_seconds = metrics.histogram('llm_request_seconds', 'LLM request latency per attempt')
+            self._token_counter = metrics.counter('llm_tokens', 'Tokens reported by the LLM APIs')
+            self._retry_counter = metrics.counter('llm_retries', 'LLM requests retried after a transient failure')
+
+    def _provider(self, name: str) -> _Provider:
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                provider = self._providers[name] = _Provider(self._limits.get(name) or ProviderLimits())
+            return provider
+
+    def _model_metrics(self, provider: str, model: str) -> ModelMetrics:
+        metrics = self._metrics.get((provider, model))
+        if metrics is None:
+            metrics = self._metrics[(provider, model)] = ModelMetrics()
+        return metrics
+
+    def timeout(self, provider: str) -> float:
+        return self._provider(provider).limits.timeout
+
+    @contextmanager
+    def slot(self, provider: str, model: str, estimated_tokens: int = 0):
+        """
+        Hold one of the provider's concurrency slots, after waiting for rate limit
+        budget, for a single attempt (also used around streamed responses).
+
+        Yields:
+            Callback taking (prompt_tokens, completion_tokens) once usage is known
+        """
+        state = self._provider(provider)
+        wait = 0.0
+        if state.requests is not None:
+            wait = state.requests.reserve(1)
+        if state.tokens is not None and estimated_tokens:
+            wait = max(wait, state.tokens.reserve(estimated_tokens))
+        if wait:
+            self.sleep(wait)
+
+        with self._lock:
+            state.waiting += 1
+        state.slots.acquire()
+        with self._lock:
+            state.waiting -= 1
+            state.in_flight += 1
+
+        usage = {}
+
+        def record_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+            usage['prompt'] = prompt_tokens or 0
+            usage['completion'] = completion_tokens or 0
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield record_usage
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            state.slots.release()
+            if usage and state.tokens is not None and estimated_tokens:
+                state.tokens.adjust(usage['prompt'] + usage['completion'] - estimated_tokens)
+            with self._lock:
+                state.in_flight -= 1
+                metrics = self._model_metrics(provider, model)
+                metrics.requests += 1
+                metrics.throttled_seconds += wait
+                metrics.total_seconds += seconds
+                metrics.max_seconds = max(metrics.max_seconds, seconds)
+                metrics.prompt_tokens += usage.get('prompt', 0)
+                metrics.completion_tokens += usage.get('completion', 0)
+                if failed:
+                    metrics.errors += 1
+            if self._request_seconds is not None:
+                self._request_seconds.observe(seconds, provider=provider, model=model,
+                                              outcome='error' if failed else 'ok')
+                for kind in ('prompt', 'completion'):
+                    if usage.get(kind):
+                        self._token_counter.inc(usage[kind], provider=provider, model=model, type=kind)
+
+    def run(self, provider: str, model: str, call: Callable[[float], Any], estimated_tokens: int = 0,
+            usage: Optional[Callable[[Any], Tuple[Optional[int], Optional[int]]]] = None) -> Any:
+        """
+        Make one request through the provider's limits, retrying transient failures.
+
+        Args:
+            provider: Provider name ('openai' or 'gemini')
+            model: Model name metrics are recorded under
+            call: Makes the request; receives the per-attempt timeout in seconds
+            estimated_tokens: Tokens reserved from the TPM budget before sending
+            usage: Returns (prompt_tokens, completion_tokens) from the response
+
+        Raises:
+            The last error once retries are exhausted, or any non-transient error
+        """
+        limits = self._provider(provider).limits
+        attempt = 0
+        while True:
+            try:
+                with self.slot(provider, model, estimated_tokens) as record_usage:
+                    response = call(limits.timeout)
+                    if usage is not None:
+                        record_usage(*usage(response))
+                    return response
+            except Exception as e:
+                self._before_retry(provider, model, limits, attempt, e)
+                attempt += 1
+
+    def stream(self, provider: str, model: str, call: Callable[[float], Iterable[Any]], estimated_tokens: int = 0,
+               usage: Optional[Callable[[Any], Tuple[Optional[int], Optional[int]]]] = None) -> Iterator[Any]:
+        """
+        Iterate over a streamed response, holding one slot until the stream ends.
+
+        Opening the stream and reading its first chunk are retried like run();
+        once a chunk has been yielded, a failure is raised to the caller, since
+        part of the response has already been consumed.
+
+        Args:
+            provider: Provider name ('openai' or 'gemini')
+            model: Model name metrics are recorded under
+            call: Opens the stream; receives the per-attempt timeout in seconds
+            estimated_tokens: Tokens reserved from the TPM budget before sending
+            usage: Returns (prompt_tokens, completion_tokens) from a chunk, or Nones
+
+        Raises:
+            The last error once retries are exhausted, any non-transient error,
+            or any error after the first chunk
+        """
+        limits = self._provider(provider).limits
+        attempt = 0
+        started = False
+        while True:
+            try:
+                with self.slot(provider, model, estimated_tokens) as record_usage:
+                    for chunk in call(limits.timeout):
+                        if usage is not None:
+                            prompt_tokens, completion_tokens = usage(chunk)
+                            if prompt_tokens is not None or completion_tokens is not None:
+                                record_usage(prompt_tokens, completion_tokens)
+                        started = True
+                        yield chunk
+                    return
+            except Exception as e:
+                if started:
+                    raise
+                self._before_retry(provider, model, limits, attempt, e)
+                attempt += 1
+
+    def _before_retry(self, provider: str, model: str, limits: ProviderLimits, attempt: int, error: Exception):
+        """Count and wait out a failed attempt, or re-raise `error` if it shouldn't be retried"""
+        if attempt >= limits.max_retries or not is_retryable(error):
+            raise error
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        with self._lock:
+            metrics = self._model_metrics(provider, model)
+            metrics.retries += 1
+            metrics.rate_limited += error_status(error) == 429
+        if self._retry_counter is not None:
+            self._retry_counter.inc(provider=provider, model=model, status=str(error_status(error) or type(error).__name__))
+        print(f"{provider} request failed ({str(error)}), retry {attempt + 1} in {delay:.2f}s")
+        self.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            providers = {
+                name: {
+                    'max_concurrency': state.limits.max_concurrency,
+                    'rpm': state.limits.rpm,
+                    'tpm': state.limits.tpm,
+                    'in_flight': state.in_flight,
+                    'waiting': state.waiting
+                }
+                for name, state in self._providers.items()
+            }
+            models = {f"{provider}/{model}": metrics.snapshot() for (provider, model), metrics in self._metrics.items()}
+        return {'providers': providers, 'models': models}
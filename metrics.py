@@ -0,0 +1,199 @@
+#metrics.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds of samples kept per series for the rolling summary
+ROLLING_WINDOW = 300
+ROLLING_MAX_SAMPLES = 2048
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        """Monotonic total per label set, exported as <name>_total."""
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name}_total {self.help}", f"# TYPE {self.name}_total counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}_total{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(key) or 'total': value for key, value in self._values.items()}
+
+
+class _Series:
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=ROLLING_MAX_SAMPLES)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 window: float = ROLLING_WINDOW, clock: Callable[[], float] = time.monotonic):
+        """
+        Duration histogram per label set.
+
+        Cumulative bucket counts, sum and count are exported in the Prometheus
+        format; the last `window` seconds of raw samples are kept as well for
+        the rolling percentiles in summary().
+
+        Args:
+            name: Metric name (seconds)
+            help_text: HELP line
+            buckets: Bucket upper bounds in seconds
+            window: Seconds of samples the rolling summary covers
+            clock: Time source, replaceable in tests
+        """
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(sorted(buckets))
+        self.window = window
+        self.clock = clock
+        self._series: Dict[LabelKey, _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.bounds))
+            for i, bound in enumerate(self.bounds):
+                if seconds <= bound:
+                    series.buckets[i] += 1
+                    break
+            series.count += 1
+            series.sum += seconds
+            series.recent.append((self.clock(), seconds))
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.bounds, series.buckets):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series.count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series.sum)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+        return lines
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, average and p50/p90/p99/max in milliseconds over the rolling window, per label set"""
+        cutoff = self.clock() - self.window
+        result = {}
+        with self._lock:
+            for key, series in self._series.items():
+                while series.recent and series.recent[0][0] < cutoff:
+                    series.recent.popleft()
+                ordered = sorted(value for _, value in series.recent)
+                if not ordered:
+                    continue
+                result[_format_labels(key) or 'all'] = {
+                    'count': len(ordered),
+                    'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                    'p50_ms': round(_percentile(ordered, 0.5) * 1000, 2),
+                    'p90_ms': round(_percentile(ordered, 0.9) * 1000, 2),
+                    'p99_ms': round(_percentile(ordered, 0.99) * 1000, 2),
+                    'max_ms': round(ordered[-1] * 1000, 2),
+                    'total_count': series.count
+                }
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str = 'vertix', window: float = ROLLING_WINDOW):
+        """
+        Named counters and histograms shared across the app, rendered together
+        for a Prometheus scrape (render_prometheus) or as a JSON rolling summary.
+
+        Args:
+            namespace: Prefix added to every metric name
+            window: Seconds covered by the histograms' rolling summaries
+        """
+        self.namespace = namespace
+        self.window = window
+        self._families: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, cls, name: str, help_text: str, **options):
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        with self._lock:
+            family = self._families.get(full_name)
+            if family is None:
+                family = self._families[full_name] = cls(full_name, help_text, **options)
+            elif not isinstance(family, cls):
+                raise ValueError(f"Metric {full_name} is already registered as a {type(family).__name__}")
+            return family
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        """The counter called `name`, created on first use"""
+        return self._family(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """The duration histogram called `name`, created on first use"""
+        return self._family(Histogram, name, help_text, buckets=buckets, window=self.window)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            families = list(self._families.items())
+        return {'window_seconds': self.window, 'metrics': {name: family.summary() for name, family in families}}
@@ -0,0 +1,270 @@
+#music_library.py
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.ogg', '.m4a', '.wav', '.opus', '.aac', '.wma')
+INDEX_VERSION = 2
+# Lowest trigram similarity accepted as a match
+MIN_SCORE = 0.45
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).replace('_', ' ').split())
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_tags(path: str) -> Dict[str, str]:
+    """
+    Title, artist and album from the file's tags (via mutagen, if installed),
+    falling back to an 'Artist - Title' file name.
+    """
+    tags = {}
+    try:
+        import mutagen
+        audio = mutagen.File(path, easy=True)
+        if audio is not None and audio.tags:
+            for field in ('title', 'artist', 'album'):
+                values = audio.tags.get(field)
+                if values:
+                    tags[field] = str(values[0])
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Error reading tags from {path}: {str(e)}")
+
+    if 'title' not in tags:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if ' - ' in stem:
+            artist, title = stem.split(' - ', 1)
+            tags.setdefault('artist', artist.strip())
+            tags['title'] = title.strip()
+        else:
+            tags['title'] = stem.replace('_', ' ').strip()
+    return tags
+
+
+class MusicLibrary:
+    def __init__(self, directories: List[str], index_path: Optional[str] = os.path.join('cache', 'music_index.json'),
+                 extensions: Tuple[str, ...] = AUDIO_EXTENSIONS, min_score: float = MIN_SCORE):
+        """
+        Searchable index of the music files in local directories.
+
+        Each track's title and artist are indexed by word (inverted index) and by
+        character trigram, so queries tolerate typos and partial names. The
+        tracks and postings are saved to `index_path`; rescans only read tags
+        from files whose size or modification time changed, and drop deleted ones.
+        In memory, postings are NumPy arrays so a query is scored against every
+        candidate track with a few vectorized bincounts.
+
+        Args:
+            directories: Folders scanned recursively for audio files
+            index_path: JSON file the index is persisted to (None keeps it in memory)
+            extensions: File extensions treated as audio
+            min_score: Lowest similarity (0-1) returned as a match
+        """
+        self.directories = [os.path.abspath(os.path.expanduser(d)) for d in directories]
+        self.index_path = index_path
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self.tracks: List[Dict[str, Any]] = []
+        self._postings: Dict[str, Dict[str, List[int]]] = {'words': {}, 'trigrams': {}, 'title_trigrams': {}}
+        self._arrays = self._to_arrays(self._postings, [], [])
+        self.last_scan = None
+        self.queries = 0
+        self.hits = 0
+        self.query_seconds = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading music index, rebuilding: {str(e)}")
+            return
+        if data.get('version') != INDEX_VERSION or data.get('directories') != self.directories:
+            return
+        self.tracks = data['tracks']
+        self._postings = data['postings']
+        self._arrays = self._to_arrays(self._postings, data['trigram_counts'], data['title_trigram_counts'])
+        self.last_scan = data.get('scanned_at')
+
+    def _save(self):
+        if not self.index_path:
+            return
+        if os.path.dirname(self.index_path):
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        data = {
+            'version': INDEX_VERSION,
+            'directories': self.directories,
+            'scanned_at': self.last_scan,
+            'tracks': self.tracks,
+            'postings': self._postings,
+            'trigram_counts': self._arrays['trigram_counts'].tolist(),
+            'title_trigram_counts': self._arrays['title_trigram_counts'].tolist()
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _walk(self):
+        for directory in self.directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.lower().endswith(self.extensions):
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        yield path, stat.st_mtime, stat.st_size
+
+    def rescan(self) -> Dict[str, int]:
+        """
+        Bring the index up to date with the directories.
+
+        Returns:
+            Counts of added, updated, removed and unchanged tracks
+        """
+        start = time.perf_counter()
+        known = {track['path']: track for track in self.tracks}
+        tracks = []
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        for path, mtime, size in self._walk():
+            track = known.pop(path, None)
+            if track is not None and track['mtime'] == mtime and track['size'] == size:
+                counts['unchanged'] += 1
+            else:
+                counts['updated' if track is not None else 'added'] += 1
+                track = dict(read_tags(path), path=path, mtime=mtime, size=size)
+            tracks.append(track)
+        counts['removed'] = len(known)
+
+        changed = counts['added'] or counts['updated'] or counts['removed']
+        if changed or not self.last_scan:
+            postings, gram_counts, title_gram_counts = self._build_postings(tracks)
+            arrays = self._to_arrays(postings, gram_counts, title_gram_counts)
+            with self._lock:
+                self.tracks, self._postings, self._arrays = tracks, postings, arrays
+        self.last_scan = time.time()
+        if changed:
+            self._save()
+        counts['seconds'] = round(time.perf_counter() - start, 3)
+        return counts
+
+    @staticmethod
+    def _searchable(track: Dict[str, Any]) -> str:
+        return normalize_text(f"{track.get('artist', '')} {track.get('title', '')}")
+
+    def _build_postings(self, tracks):
+        postings = {'words': {}, 'trigrams': {}, 'title_trigrams': {}}
+        gram_counts = []
+        title_gram_counts = []
+        for track_id, track in enumerate(tracks):
+            text = self._searchable(track)
+            for word in set(text.split()):
+                postings['words'].setdefault(word, []).append(track_id)
+            track_grams = trigrams(text)
+            gram_counts.append(len(track_grams))
+            for gram in track_grams:
+                postings['trigrams'].setdefault(gram, []).append(track_id)
+            title_grams = trigrams(normalize_text(track.get('title', '')))
+            title_gram_counts.append(len(title_grams))
+            for gram in title_grams:
+                postings['title_trigrams'].setdefault(gram, []).append(track_id)
+        return postings, gram_counts, title_gram_counts
+
+    @staticmethod
+    def _to_arrays(postings, gram_counts, title_gram_counts):
+        arrays = {
+            name: {key: np.asarray(ids, dtype=np.int32) for key, ids in table.items()}
+            for name, table in postings.items()
+        }
+        arrays['trigram_counts'] = np.asarray(gram_counts, dtype=np.float32)
+        arrays['title_trigram_counts'] = np.asarray(title_gram_counts, dtype=np.float32)
+        return arrays
+
+    @staticmethod
+    def _count(table, keys, size: int) -> np.ndarray:
+        lists = [table[key] for key in keys if key in table]
+        if not lists:
+            return np.zeros(size, dtype=np.float32)
+        return np.bincount(np.concatenate(lists), minlength=size).astype(np.float32)
+
+    def search(self, query: str, limit: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Best matching tracks for a free-text query such as "bohemian rhapsody queen".
+
+        Each track is scored by trigram Dice similarity against the query, using
+        either artist + title or the title alone, whichever is higher (so "play
+        yesterday" matches without naming the artist). Ties go to the track
+        sharing more whole words with the query.
+
+        Returns:
+            List of (track, score) pairs, best first, with score >= min_score
+        """
+        start = time.perf_counter()
+        text = normalize_text(query)
+        results = []
+        with self._lock:
+            tracks, arrays = self.tracks, self._arrays
+        if text and tracks:
+            size = len(tracks)
+            query_grams = trigrams(text)
+            full = 2 * self._count(arrays['trigrams'], query_grams, size) / (len(query_grams) + arrays['trigram_counts'])
+            title = 2 * self._count(arrays['title_trigrams'], query_grams, size) / (len(query_grams) + arrays['title_trigram_counts'])
+            scores = np.maximum(full, title)
+            word_hits = self._count(arrays['words'], set(text.split()), size)
+
+            candidates = np.flatnonzero(scores >= self.min_score)
+            order = np.lexsort((-word_hits[candidates], -scores[candidates]))[:limit]
+            results = [(tracks[i], round(float(scores[i]), 3)) for i in candidates[order]]
+
+        self.queries += 1
+        self.hits += bool(results)
+        self.query_seconds += time.perf_counter() - start
+        return results
+
+    def best_match(self, query: str) -> Optional[Dict[str, Any]]:
+        results = self.search(query, limit=1)
+        return results[0][0] if results else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'directories': self.directories,
+            'tracks': len(self.tracks),
+            'last_scan': self.last_scan,
+            'queries': self.queries,
+            'hits': self.hits,
+            'avg_query_ms': round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index music folders and time queries against the index")
+    parser.add_argument('directories', nargs='+')
+    parser.add_argument('--query', action='append', default=[])
+    parser.add_argument('--index', default=os.path.join('cache', 'music_index.json'))
+    args = parser.parse_args()
+
+    library = MusicLibrary(args.directories, index_path=args.index)
+    print(json.dumps(library.rescan()))
+    for query in args.query:
+        print(query, '->', [(track.get('artist'), track.get('title'), score) for track, score in library.search(query)])
+    print(json.dumps(library.stats(), indent=2))
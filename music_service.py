@@ -1,43 +1,175 @@
 #music_service.py
-from youtube_search import YoutubeSearch
-import json
-import webbrowser
+import re
+import threading
 import time
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
 
-class YouTubeHelper:
+from cache_utils import MISSING, TTLCache
+
+SEARCH_CACHE_TTL = 60 * 60
+# Queries with no results are retried sooner
+EMPTY_RESULT_TTL = 5 * 60
+SEARCH_TIMEOUT = 8.0
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(re.sub(r'[^\w\s]', ' ', query.lower()).split())
+
+
+class YoutubeSearchProvider:
     def __init__(self):
+        """Scrapes YouTube search results through the youtube_search package."""
+        self.name = 'youtube'
+
+    def search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+        from youtube_search import YoutubeSearch
+        return YoutubeSearch(query, max_results=max_results).to_dict()
+
+
+class FakeSearchProvider:
+    def __init__(self, results: Optional[Dict[str, List[Dict[str, Any]]]] = None, delay: float = 0.0):
+        """
+        Offline provider for tests: returns canned results per normalized query,
+        or generated ones, after an optional delay. Calls are counted.
+        """
+        self.name = 'fake'
+        self.results = results or {}
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        key = normalize_query(query)
+        if key in self.results:
+            return self.results[key][:max_results]
+        slug = key.replace(' ', '-')
+        return [{
+            'id': f"{slug}-{i}",
+            'title': f"{query.title()} (result {i})",
+            'channel': 'Fake Channel',
+            'duration': '3:30',
+            'url_suffix': f"/watch?v={slug}-{i}"
+        } for i in range(1, max_results + 1)]
+
+
+class YouTubeHelper:
+    def __init__(self, provider=None, max_results: int = 3, timeout: float = SEARCH_TIMEOUT,
+                 cache_size: int = 128, cache_ttl: float = SEARCH_CACHE_TTL, open_browser: bool = True):
+        """
+        YouTube search for the music commands.
+
+        Results are cached by normalized query (LRU + TTL), so repeated requests
+        skip the scrape entirely. Searches run on a background pool and the
+        caller waits at most `timeout` seconds; a slow search keeps running and
+        fills the cache for the next request. Concurrent requests for the same
+        query share one fetch.
+
+        Args:
+            provider: Search provider (defaults to scraping YouTube)
+            max_results: Results per search
+            timeout: Seconds to wait for a search before replying
+            cache_size: Queries kept in the cache
+            cache_ttl: Seconds search results stay valid
+            open_browser: Open the top result in the default browser
+        """
+        self.provider = provider or YoutubeSearchProvider()
+        self.max_results = max_results
+        self.timeout = timeout
+        self.open_browser = open_browser
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='youtube')
+        self._in_flight = {}
+        self._lock = threading.Lock()
         self.last_search = None
-        
+        self.timeouts = 0
+        self.fetches = 0
+        self.fetch_seconds = 0.0
+
+    def _fetch(self, key: str, query: str) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            videos = self.provider.search(query, max_results=self.max_results)
+            self.cache.set(key, videos, ttl=None if videos else EMPTY_RESULT_TTL)
+            return videos
+        finally:
+            self.fetches += 1
+            self.fetch_seconds += time.perf_counter() - start
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _start_fetch(self, key: str, query: str):
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = self._executor.submit(self._fetch, key, query)
+            return future
+
+    def search(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns:
+            List of result dicts, or None if the search didn't finish within the timeout
+
+        Raises:
+            Whatever the provider raised
+        """
+        key = normalize_query(query)
+        videos = self.cache.get(key)
+        if videos is not MISSING:
+            return videos
+        try:
+            return self._start_fetch(key, query).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            return None
+
     def search_and_play(self, query):
         """Search for a song on YouTube, return results, and open top result"""
         try:
-            results = YoutubeSearch(query, max_results=3).to_json()
-            results = json.loads(results)
-            
-            if results and results.get('videos'):
+            videos = self.search(query)
+            if videos is None:
+                return f"YouTube is taking a while to answer. I'm still searching for {query}, ask me again in a moment."
+
+            if videos:
                 # Store first video URL for auto-play
-                first_video = results['videos'][0]
+                first_video = videos[0]
                 video_url = f"https://youtube.com{first_video.get('url_suffix')}"
-                
+
                 # Open URL in default browser
-                webbrowser.open(video_url)
-                
+                if self.open_browser:
+                    webbrowser.open(video_url)
+                    response = f"Opening {first_video.get('title')} by {first_video.get('channel')} in your browser. Here are some matches I found:\n\n"
+                else:
+                    response = "Here are some matches I found:\n\n"
+
                 # Construct response with all results
-                response = f"Opening the top result in your browser and here are some matches I found:\n\n"
-                for i, video in enumerate(results['videos'][:3], 1):
+                for i, video in enumerate(videos[:3], 1):
                     title = video.get('title')
                     duration = video.get('duration')
                     url = f"https://youtube.com{video.get('url_suffix')}"
                     channel = video.get('channel')
-                    
+
                     response += f"{i}. {title}\n"
                     response += f"   Duration: {duration}\n"
                     response += f"   Channel: {channel}\n"
                     response += f"   Link: {url}\n\n"
-                
-                self.last_search = results
+
+                self.last_search = {'videos': videos}
                 return response
             return "Sorry, I couldn't find any matches for that song."
-            
+
         except Exception as e:
             return f"Sorry, I encountered an error while searching: {str(e)}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'provider': self.provider.name,
+            'cache': self.cache.stats(),
+            'fetches': self.fetches,
+            'avg_fetch_ms': round(self.fetch_seconds / self.fetches * 1000, 2) if self.fetches else 0,
+            'timeouts': self.timeouts,
+            'in_flight': len(self._in_flight)
+        }
@@ -0,0 +1,106 @@
+#service_registry.py
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ServiceRegistry:
+    def __init__(self):
+        """
+        Registry of lazily constructed services.
+
+        Each service is registered as a zero-argument factory and only built the
+        first time it is requested, so importing the app does not pay for models,
+        API clients or heavy libraries that the current route never touches.
+        """
+        self.created_at = time.perf_counter()
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._timings: Dict[str, Dict[str, Any]] = {}
+        self._errors: Dict[str, str] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register a factory for a service.
+
+        Args:
+            name: Name the service is looked up by
+            factory: Callable returning the service instance
+        """
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+            self._instances.pop(name, None)
+            self._errors.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Return the service instance, building it on first use.
+
+        Each service has its own lock, so a slow factory (e.g. the emotion model)
+        does not block other services from being created concurrently.
+        """
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+
+            print(f"Initializing service: {name}")
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                raise
+            elapsed = time.perf_counter() - start
+
+            self._timings[name] = {
+                'init_seconds': round(elapsed, 4),
+                'loaded_at': time.strftime("%H:%M:%S"),
+                'seconds_after_start': round(start - self.created_at, 4)
+            }
+            self._errors.pop(name, None)
+            self._instances[name] = instance
+            return instance
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Eagerly build the given services (or all of them).
+
+        Returns:
+            Dictionary mapping service name to its status and init time
+        """
+        results = {}
+        for name in (names if names is not None else list(self._factories)):
+            try:
+                self.get(name)
+                results[name] = {'status': 'loaded', **self._timings.get(name, {})}
+            except Exception as e:
+                results[name] = {'status': 'error', 'error': str(e)}
+        return results
+
+    def startup_report(self) -> Dict[str, Any]:
+        """Summarize which services are loaded and how long each took to build."""
+        services = {}
+        for name in self._factories:
+            if name in self._instances:
+                services[name] = {'status': 'loaded', **self._timings[name]}
+            elif name in self._errors:
+                services[name] = {'status': 'error', 'error': self._errors[name]}
+            else:
+                services[name] = {'status': 'not_loaded'}
+
+        return {
+            'uptime_seconds': round(time.perf_counter() - self.created_at, 4),
+            'total_init_seconds': round(sum(t['init_seconds'] for t in self._timings.values()), 4),
+            'services': services
+        }
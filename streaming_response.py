@@ -0,0 +1,156 @@
+#streaming_response.py
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Iterable, Iterator, List, Optional
+
+# Words that end in a period without ending the sentence
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e', 'approx'}
+# Abbreviations only when a number follows ("No. 5"), otherwise ordinary words ("The answer is no.")
+NUMBER_ABBREVIATIONS = {'no'}
+# Shorter sentences ("Sure.", "Okay!") are merged into the next one
+MIN_SENTENCE_CHARS = 8
+SENTENCE_END = re.compile(r'([.!?]+["\')\]]*)(\s+)|(\n\s*\n|\n)')
+
+
+class SentenceChunker:
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        """
+        Incrementally split streamed text into speakable sentences.
+
+        Args:
+            min_chars: Sentences shorter than this are merged with the next one,
+                so TTS isn't invoked for fragments like "Sure."
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+        self.text = ""
+
+    @staticmethod
+    def _last_word(text: str) -> str:
+        words = text.rstrip('.!?"\')]').split()
+        return words[-1].lower() if words else ''
+
+    def feed(self, delta: str) -> List[str]:
+        """Add streamed text and return any sentences completed by it"""
+        if not delta:
+            return []
+        self.text += delta
+        self.buffer += delta
+
+        sentences = []
+        search_from = 0
+        while True:
+            match = SENTENCE_END.search(self.buffer, search_from)
+            if not match:
+                break
+            end = match.end(1) if match.group(1) else match.start(3)
+            candidate = self.buffer[:end].strip()
+            if match.group(1):
+                last_word = self._last_word(self.buffer[:match.start(1)])
+                if last_word in ABBREVIATIONS:
+                    search_from = match.end()
+                    continue
+                if last_word in NUMBER_ABBREVIATIONS and match.group(1) == '.':
+                    if match.end() == len(self.buffer):
+                        # Whether "No." ends the sentence depends on the next token
+                        break
+                    if self.buffer[match.end()].isdigit():
+                        search_from = match.end()
+                        continue
+            if len(candidate) < self.min_chars:
+                search_from = match.end()
+                continue
+            sentences.append(candidate)
+            self.buffer = self.buffer[match.end():]
+            search_from = 0
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has finished"""
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return [remainder] if remainder else []
+
+
+class StreamingResponse:
+    def __init__(self, client, min_chars: int = MIN_SENTENCE_CHARS, **params):
+        """
+        Stream a chat completion and iterate over it sentence by sentence.
+
+        The full reply is available as .text once iteration has finished.
+
+        Args:
+            client: OpenAI-compatible client (or FakeStreamingClient)
+            min_chars: Minimum sentence length passed to SentenceChunker
+            **params: Arguments for client.chat.completions.create
+        """
+        self.client = client
+        self.params = params
+        self.chunker = SentenceChunker(min_chars)
+        self.first_token_seconds: Optional[float] = None
+        # Token counts, if the API reports them (stream_options={'include_usage': True})
+        self.usage = None
+
+    @property
+    def text(self) -> str:
+        return self.chunker.text
+
+    def _chunks(self) -> Iterable[Any]:
+        return self.client.chat.completions.create(stream=True, **self.params)
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        for chunk in self._chunks():
+            if getattr(chunk, 'usage', None) is not None:
+                self.usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta and self.first_token_seconds is None:
+                self.first_token_seconds = time.perf_counter() - start
+            yield from self.chunker.feed(delta)
+        yield from self.chunker.flush()
+
+
+class FakeStreamingClient:
+    def __init__(self, responses: Iterable[str] = ("This is a canned reply. It arrives in small pieces!",),
+                 chunk_size: int = 4, delay: float = 0.0):
+        """
+        Offline stand-in for the OpenAI client's chat completions API.
+
+        Replies cycle through `responses`. With stream=True the reply is emitted
+        in `chunk_size`-character deltas, `delay` seconds apart, shaped like the
+        OpenAI streaming chunks; otherwise a single completion is returned. Swap
+        it in with services.register('openai_client', FakeStreamingClient).
+        """
+        self.responses = list(responses)
+        self.chunk_size = max(1, chunk_size)
+        self.delay = delay
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _next_response(self) -> str:
+        return self.responses[(len(self.calls) - 1) % len(self.responses)]
+
+    def _create(self, model: str = None, messages=None, stream: bool = False, **params):
+        self.calls.append({'model': model, 'messages': messages, 'stream': stream, **params})
+        text = self._next_response()
+        # Roughly four characters per token
+        usage = SimpleNamespace(prompt_tokens=sum(len(m.get('content') or '') for m in messages or []) // 4,
+                                completion_tokens=len(text) // 4)
+        if not stream:
+            message = SimpleNamespace(role='assistant', content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=usage)
+        include_usage = (params.get('stream_options') or {}).get('include_usage')
+        return self._stream(text, usage if include_usage else None)
+
+    def _stream(self, text: str, usage=None):
+        for i in range(0, len(text), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            delta = SimpleNamespace(content=text[i:i + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason='stop')])
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
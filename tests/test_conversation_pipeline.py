@@ -0,0 +1,79 @@
+import threading
+import time
+
+from conversation_pipeline import ConversationPipeline
+
+IDLE = 0.2
+SPEECH = 0.05
+
+
+class Observations:
+    def __init__(self):
+        self.seen = []
+        self.turns = threading.Semaphore(0)
+
+    def __call__(self, name, seconds, failed):
+        self.seen.append((name, seconds))
+        if name == 'turn':
+            self.turns.release()
+
+    def wait_for_turns(self, count: int):
+        for _ in range(count):
+            assert self.turns.acquire(timeout=2), "turn was not observed"
+
+    def durations(self, name):
+        return [seconds for seen, seconds in self.seen if seen == name]
+
+
+def make_source(turns: int):
+    """Each turn idles, then 'speaks' from an onset it reports"""
+    remaining = [turns]
+
+    def source():
+        if not remaining[0]:
+            time.sleep(0.05)
+            return None
+        remaining[0] -= 1
+        time.sleep(IDLE)
+        onset = time.perf_counter()
+        time.sleep(SPEECH)
+        return {'onset': onset}
+    return source
+
+
+def run(pipeline: ConversationPipeline, observations: Observations, turns: int):
+    pipeline.start()
+    try:
+        observations.wait_for_turns(turns)
+    finally:
+        pipeline.stop()
+        pipeline.join()
+
+
+def test_turns_are_timed_from_onset():
+    observations = Observations()
+    pipeline = ConversationPipeline(make_source(2), [('respond', lambda turn: turn)], observer=observations,
+                                    turn_start=lambda turn: turn['onset'])
+    run(pipeline, observations, 2)
+
+    assert len(observations.durations('record_wait')) == 2
+    assert all(seconds >= IDLE for seconds in observations.durations('record_wait'))
+    assert all(seconds < IDLE for seconds in observations.durations('record'))
+    assert all(seconds < IDLE for seconds in observations.durations('turn'))
+    assert pipeline.stats()['stages']['record_wait']['processed'] == 2
+
+
+def test_streamed_turn_is_observed_once():
+    def respond(turn):
+        yield {'sentence': 1}
+        yield {'sentence': 2}
+        yield dict(turn, message_id=1)
+
+    observations = Observations()
+    pipeline = ConversationPipeline(make_source(2), [('respond', respond), ('speak', lambda turn: turn)],
+                                    observer=observations, is_turn_end=lambda turn: 'message_id' in turn)
+    run(pipeline, observations, 2)
+
+    assert len(observations.durations('speak')) == 6
+    assert len(observations.durations('turn')) == 2
+    assert pipeline.stats()['turn']['processed'] == 2
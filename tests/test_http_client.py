@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+import requests
+
+from http_client import HttpClient
+from weather_service import WeatherService
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        server = self.server
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            server.clients.add(self.client_address)
+            hits = server.hits[path]
+        if path == '/slow':
+            time.sleep(0.5)
+        if path == '/flaky' and hits == 1:
+            self.reply(503, {'error': 'try again'}, {'Retry-After': '0'})
+        elif path == '/down':
+            self.reply(503, {'error': 'down'})
+        elif path == '/geo/1.0/direct':
+            self.reply(200, [{'lat': 48.8566, 'lon': 2.3522}])
+        elif path == '/data/2.5/weather':
+            self.reply(200, {'main': {'temp': 18.5, 'humidity': 60}, 'weather': [{'description': 'clear sky'}],
+                             'wind': {'speed': 3.1}})
+        else:
+            self.reply(200, {'path': path, 'hits': hits})
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.hits = {}
+    server.clients = set()
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(timeout=(1, 0.2), retries=1, backoff_factor=0)
+    yield client
+    client.close()
+
+
+def test_connections_are_reused(server, client):
+    for _ in range(5):
+        assert client.get_json(f"{server.url}/ping", name='ping')['path'] == '/ping'
+    assert server.hits['/ping'] == 5
+    assert len(server.clients) == 1
+
+
+def test_transient_error_is_retried(server, client):
+    assert client.get_json(f"{server.url}/flaky", name='flaky')['hits'] == 2
+    stats = client.stats()['flaky']
+    assert (stats['requests'], stats['errors']) == (1, 0)
+
+
+def test_persistent_error_raises_after_retries(server, client):
+    with pytest.raises(requests.HTTPError):
+        client.get(f"{server.url}/down", name='down')
+    assert server.hits['/down'] == 2
+    assert client.stats()['down']['errors'] == 1
+
+
+def test_timeout_is_retried_then_raised(server, client):
+    # Read timeouts are retried by urllib3, then surface as a RequestException
+    with pytest.raises(requests.RequestException):
+        client.get(f"{server.url}/slow", name='slow')
+    assert server.hits['/slow'] == 2
+    stats = client.stats()['slow']
+    assert (stats['requests'], stats['errors']) == (1, 1)
+    assert stats['max_ms'] >= 400
+
+
+def test_metrics_are_kept_per_endpoint(server, client):
+    client.get(f"{server.url}/a", name='a')
+    client.get(f"{server.url}/a", name='a')
+    client.get(f"{server.url}/b")
+    stats = client.stats()
+    assert stats['a']['requests'] == 2
+    assert stats[f"{server.url}/b"]['requests'] == 1
+
+
+def test_weather_service_against_stub(server, client, monkeypatch):
+    monkeypatch.setenv('WEATHER_API_KEY', 'test-key')
+    weather = WeatherService(http_client=client, base_url=server.url, geocode_cache_path=None)
+    assert weather.get_weather('Paris') == {'temperature': 18.5, 'description': 'clear sky', 'humidity': 60,
+                                            'wind_speed': 3.1}
+    weather.get_weather('paris')
+    assert server.hits == {'/geo/1.0/direct': 1, '/data/2.5/weather': 1}
+    assert client.stats()['openweather.geocode']['requests'] == 1
+    assert len(server.clients) == 1
+
+
+def test_weather_service_without_writable_cache_dir(server, client, monkeypatch, tmp_path):
+    monkeypatch.setenv('WEATHER_API_KEY', 'test-key')
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    weather = WeatherService(http_client=client, base_url=server.url,
+                             geocode_cache_path=str(blocker / "weather.sqlite3"))
+    assert weather.get_weather('Paris')['temperature'] == 18.5
+    assert weather.geocode('paris') == (48.8566, 2.3522)
+    assert server.hits['/geo/1.0/direct'] == 1
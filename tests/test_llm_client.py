@@ -0,0 +1,101 @@
+import pytest
+
+from llm_client import FakeLLMProvider, LLMClient, LLMResponseCache
+from llm_dispatch import LLMDispatcher
+
+MODEL = "gpt-test"
+MESSAGES = [{"role": "user", "content": "What does a cache do?"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def provider():
+    return FakeLLMProvider(responses=["first reply", "second reply"])
+
+
+def make_client(provider, cache) -> LLMClient:
+    return LLMClient(provider, cache=cache, dispatcher=LLMDispatcher(sleep=lambda seconds: None))
+
+
+def test_identical_request_is_a_cache_hit(provider, tmp_path):
+    llm = make_client(provider, LLMResponseCache(str(tmp_path / "llm.sqlite3")))
+    assert llm.chat(MODEL, MESSAGES) == "first reply"
+    assert llm.chat(MODEL, MESSAGES) == "first reply"
+    assert len(provider.calls) == 1
+    assert (llm.hits, llm.misses) == (1, 1)
+
+
+def test_different_params_miss(provider):
+    llm = make_client(provider, LLMResponseCache(None))
+    llm.chat(MODEL, MESSAGES)
+    assert llm.chat(MODEL, MESSAGES, temperature=0.2) == "second reply"
+    assert len(provider.calls) == 2
+    assert (llm.hits, llm.misses) == (0, 2)
+
+
+def test_disk_tier_outlives_the_client(provider, tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    make_client(provider, LLMResponseCache(path)).chat(MODEL, MESSAGES)
+    llm = make_client(provider, LLMResponseCache(path))
+    assert llm.chat(MODEL, MESSAGES) == "first reply"
+    assert len(provider.calls) == 1
+
+
+def test_bypass_neither_reads_nor_writes(provider):
+    cache = LLMResponseCache(None)
+    llm = make_client(provider, cache)
+    llm.chat(MODEL, MESSAGES)
+    assert llm.chat(MODEL, MESSAGES, bypass=True) == "second reply"
+    assert llm.chat(MODEL, [{"role": "user", "content": "Something new"}], bypass=True) == "first reply"
+    assert len(cache.memory) == 1
+    assert llm.bypassed == 2
+
+
+def test_entries_expire_after_ttl(provider):
+    clock = Clock()
+    cache = LLMResponseCache(None, ttl=60)
+    cache.memory.clock = clock
+    llm = make_client(provider, cache)
+    llm.chat(MODEL, MESSAGES)
+    clock.now = 59
+    assert llm.chat(MODEL, MESSAGES) == "first reply"
+    clock.now = 61
+    assert llm.chat(MODEL, MESSAGES) == "second reply"
+    assert len(provider.calls) == 2
+
+
+def test_short_cache_ttl_stays_in_memory(provider, tmp_path):
+    clock = Clock()
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"))
+    cache.memory.clock = clock
+    llm = make_client(provider, cache)
+    llm.chat(MODEL, MESSAGES, cache_ttl=5)
+    assert cache.disk.stats()['entries'] == 0
+    assert llm.chat(MODEL, MESSAGES, cache_ttl=5) == "first reply"
+    clock.now = 6
+    assert llm.chat(MODEL, MESSAGES, cache_ttl=5) == "second reply"
+
+
+def test_unwritable_path_falls_back_to_memory(provider, tmp_path):
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    cache = LLMResponseCache(str(blocker / "llm.sqlite3"))
+    assert cache.disk is None
+    llm = make_client(provider, cache)
+    llm.chat(MODEL, MESSAGES)
+    assert llm.chat(MODEL, MESSAGES) == "first reply"
+    assert len(provider.calls) == 1
+
+
+def test_generate_is_cached(provider):
+    llm = make_client(provider, LLMResponseCache(None))
+    assert llm.generate(provider, "Explain this code") == "first reply"
+    assert llm.generate(provider, "Explain this code") == "first reply"
+    assert len(provider.calls) == 1
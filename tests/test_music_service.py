@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from music_service import EMPTY_RESULT_TTL, FakeSearchProvider, YouTubeHelper
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_helper(provider, clock, cache_ttl: float = 60, **options) -> YouTubeHelper:
+    helper = YouTubeHelper(provider=provider, open_browser=False, cache_ttl=cache_ttl, **options)
+    helper.cache.clock = clock
+    return helper
+
+
+def test_repeated_query_is_a_cache_hit(clock):
+    provider = FakeSearchProvider()
+    helper = make_helper(provider, clock)
+    first = helper.search("Imagine Dragons Believer")
+    assert helper.search("imagine dragons, believer!") == first
+    assert provider.calls == 1
+    assert helper.cache.stats()['hits'] == 1
+
+
+def test_different_query_misses(clock):
+    provider = FakeSearchProvider()
+    helper = make_helper(provider, clock)
+    helper.search("believer")
+    helper.search("thunder")
+    assert provider.calls == 2
+
+
+def test_results_expire_after_ttl(clock):
+    provider = FakeSearchProvider()
+    helper = make_helper(provider, clock)
+    helper.search("believer")
+    clock.now = 59
+    helper.search("believer")
+    assert provider.calls == 1
+    clock.now = 61
+    helper.search("believer")
+    assert provider.calls == 2
+
+
+def test_empty_results_expire_sooner(clock):
+    provider = FakeSearchProvider(results={'nothing here': []})
+    helper = make_helper(provider, clock, cache_ttl=EMPTY_RESULT_TTL * 10)
+    assert helper.search("nothing here") == []
+    clock.now = EMPTY_RESULT_TTL + 1
+    helper.search("nothing here")
+    assert provider.calls == 2
+
+
+def test_slow_search_times_out_then_fills_cache(clock):
+    provider = FakeSearchProvider(delay=0.2)
+    helper = make_helper(provider, clock, timeout=0.01)
+    assert helper.search("believer") is None
+    assert helper.timeouts == 1
+    helper._start_fetch("believer", "believer").result(timeout=2)
+    assert helper.search("believer") is not None
+    assert provider.calls == 1
+
+
+def test_concurrent_searches_share_one_fetch(clock):
+    provider = FakeSearchProvider(delay=0.1)
+    helper = make_helper(provider, clock)
+    threads = [threading.Thread(target=helper.search, args=("believer",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert provider.calls == 1
+
+
+def test_reply_without_browser(clock):
+    helper = make_helper(FakeSearchProvider(), clock)
+    reply = helper.search_and_play("believer")
+    assert reply.startswith("Here are some matches I found:")
+    assert "browser" not in reply
+    assert "1. Believer (result 1)" in reply
@@ -0,0 +1,77 @@
+import pytest
+
+from streaming_response import FakeStreamingClient, SentenceChunker, StreamingResponse
+
+CHUNK_SIZES = [1, 3, 7, 1000]
+
+
+def stream(text: str, chunk_size: int, **params) -> StreamingResponse:
+    client = FakeStreamingClient([text], chunk_size=chunk_size)
+    return StreamingResponse(client, model="fake", messages=[{"role": "user", "content": "hi"}], **params)
+
+
+def sentences(text: str, chunk_size: int):
+    return list(stream(text, chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_sentence_boundaries_split_across_chunks(chunk_size):
+    text = "The weather is sunny today. Do you want the forecast? It looks great!"
+    assert sentences(text, chunk_size) == [
+        "The weather is sunny today.",
+        "Do you want the forecast?",
+        "It looks great!"
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_abbreviations_and_decimals_stay_in_the_sentence(chunk_size):
+    text = "Dr. Smith measured 3.14 meters, e.g. a lot. Then Mr. Jones left."
+    assert sentences(text, chunk_size) == [
+        "Dr. Smith measured 3.14 meters, e.g. a lot.",
+        "Then Mr. Jones left."
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_flush_returns_unterminated_remainder(chunk_size):
+    response = stream("Here is your answer. And a trailing thought", chunk_size)
+    assert list(response) == ["Here is your answer.", "And a trailing thought"]
+    assert response.text == "Here is your answer. And a trailing thought"
+
+
+def test_short_sentences_are_merged():
+    assert sentences("Sure. Here is the weather for today.", 4) == ["Sure. Here is the weather for today."]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_no_ends_a_sentence_unless_a_number_follows(chunk_size):
+    text = "The answer is no. Room No. 5 is free. Try again later."
+    assert sentences(text, chunk_size) == [
+        "The answer is no.",
+        "Room No. 5 is free.",
+        "Try again later."
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_sentence_ending_in_a_number(chunk_size):
+    text = "I counted all the way to 10. Then I stopped counting."
+    assert sentences(text, chunk_size) == ["I counted all the way to 10.", "Then I stopped counting."]
+
+
+def test_trailing_no_waits_for_the_next_token():
+    chunker = SentenceChunker()
+    assert chunker.feed("The answer is no. ") == []
+    assert chunker.feed("5 is the room.") == []
+    assert chunker.flush() == ["The answer is no. 5 is the room."]
+    chunker = SentenceChunker()
+    assert chunker.feed("The answer is no. ") == []
+    assert chunker.feed("Sorry about that. ") == ["The answer is no.", "Sorry about that."]
+
+
+def test_usage_is_recorded_when_requested():
+    response = stream("A reply that reports usage.", 5, stream_options={"include_usage": True})
+    list(response)
+    assert response.usage.completion_tokens == len("A reply that reports usage.") // 4
+    assert response.first_token_seconds is not None
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+from audio_buffer import AudioRingBuffer
+from transcription_service import PartialTranscriber, create_transcription_backend
+
+SAMPLE_RATE = 16000
+BLOCK = 1600  # 100 ms
+SENTENCE = "the quick brown fox jumps"
+
+
+def clip(seconds: float) -> np.ndarray:
+    """Fixed 440 Hz tone, shaped like the callback's (frames, channels) blocks"""
+    t = np.arange(int(SAMPLE_RATE * seconds), dtype=np.float32) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32).reshape(-1, 1)
+
+
+def feed(buffer: AudioRingBuffer, samples: np.ndarray):
+    for i in range(0, len(samples), BLOCK):
+        buffer.append(samples[i:i + BLOCK])
+
+
+@pytest.fixture
+def buffer():
+    buffer = AudioRingBuffer(SAMPLE_RATE)
+    buffer.start()
+    return buffer
+
+
+class Recording:
+    def __init__(self, buffer: AudioRingBuffer):
+        """Snapshots only audio that has been fed completely, so passes never see half a clip"""
+        self.buffer = buffer
+        self.visible = 0
+
+    def feed(self, samples: np.ndarray):
+        feed(self.buffer, samples)
+        self.visible = len(self.buffer)
+
+    def __call__(self) -> np.ndarray:
+        return self.buffer.view()[:self.visible].copy()
+
+
+class PartialRecorder:
+    def __init__(self):
+        self.partials = []
+        self.changed = threading.Event()
+
+    def __call__(self, text):
+        self.partials.append(text)
+        self.changed.set()
+
+    def wait(self):
+        assert self.changed.wait(timeout=2), "no partial transcript arrived"
+        self.changed.clear()
+
+
+def test_stub_partials_reveal_words_with_audio(buffer):
+    backend = create_transcription_backend('stub', responses=[SENTENCE])
+    feed(buffer, clip(1.0))
+    assert backend.transcribe_partial(buffer.view(), SAMPLE_RATE) == "the quick"
+    feed(buffer, clip(1.5))
+    assert backend.transcribe_partial(buffer.view(), SAMPLE_RATE) == SENTENCE
+
+
+def test_partial_and_final_transcripts(buffer):
+    backend = create_transcription_backend('stub', responses=[SENTENCE, "second utterance"])
+    recorder = PartialRecorder()
+    recording = Recording(buffer)
+    transcriber = PartialTranscriber(backend, recording, SAMPLE_RATE, recorder, interval=0.01, min_seconds=0.5)
+    recording.feed(clip(0.5))
+    transcriber.start()
+    try:
+        recorder.wait()
+        recording.feed(clip(1.0))
+        recorder.wait()
+        recording.feed(clip(1.0))
+        recorder.wait()
+    finally:
+        transcriber.stop()
+
+    assert recorder.partials == ["the", "the quick brown", SENTENCE]
+    assert backend.transcribe(buffer.view(), SAMPLE_RATE) == SENTENCE
+    assert backend.transcribe(clip(1.0), SAMPLE_RATE) == "second utterance"
+
+
+def test_no_partials_before_min_seconds(buffer):
+    backend = create_transcription_backend('stub', responses=[SENTENCE])
+    recorder = PartialRecorder()
+    recording = Recording(buffer)
+    transcriber = PartialTranscriber(backend, recording, SAMPLE_RATE, recorder, interval=0.01, min_seconds=0.5)
+    recording.feed(clip(0.3))
+    transcriber.start()
+    try:
+        assert not recorder.changed.wait(timeout=0.2)
+    finally:
+        transcriber.stop()
+    assert recorder.partials == []
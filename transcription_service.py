@@ -0,0 +1,194 @@
+#transcription_service.py
+import io
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+TRANSCRIPTION_BACKENDS = ('openai', 'local', 'stub')
+
+
+def load_audio_array(audio, sample_rate: Optional[int] = None) -> np.ndarray:
+    """
+    Return mono float32 samples from a NumPy array, WAV buffer or file path.
+    """
+    if isinstance(audio, np.ndarray):
+        samples = audio
+    else:
+        import soundfile as sf
+        if hasattr(audio, 'seek'):
+            audio.seek(0)
+        samples, _ = sf.read(audio, dtype='float32', always_2d=True)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+class OpenAIWhisperBackend:
+    accepts_arrays = False
+    supports_partials = False
+
+    def __init__(self, client, model: str = "whisper-1"):
+        """Transcription through the OpenAI Whisper API (requires network access)."""
+        self.name = 'openai'
+        self.client = client
+        self.model = model
+
+    def transcribe(self, audio, sample_rate: Optional[int] = None) -> str:
+        if isinstance(audio, str):
+            with open(audio, 'rb') as audio_file:
+                transcript = self.client.audio.transcriptions.create(model=self.model, file=audio_file)
+            return transcript.text
+
+        if isinstance(audio, np.ndarray):
+            import soundfile as sf
+            buffer = io.BytesIO()
+            sf.write(buffer, audio, sample_rate, format='WAV')
+            audio = buffer
+        audio.seek(0)
+        transcript = self.client.audio.transcriptions.create(
+            model=self.model,
+            file=(getattr(audio, 'name', 'speech.wav'), audio)
+        )
+        return transcript.text
+
+
+class LocalWhisperBackend:
+    accepts_arrays = True
+    supports_partials = True
+
+    def __init__(self, model_size: str = "base.en", compute_type: str = "int8",
+                 num_threads: int = 0, language: Optional[str] = "en"):
+        """
+        Offline CPU transcription with an int8-quantized Whisper model (faster-whisper).
+
+        Args:
+            model_size: faster-whisper model name or path (e.g. 'tiny.en', 'base.en')
+            compute_type: CTranslate2 compute type; 'int8' keeps it fast on CPU
+            num_threads: CPU threads (0 lets CTranslate2 decide)
+            language: Fixed language code, or None to auto-detect
+        """
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("The local transcription backend requires faster-whisper (pip install faster-whisper)")
+        self.name = 'local'
+        self.language = language
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=num_threads)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, sample_rate: Optional[int] = None) -> str:
+        samples = load_audio_array(audio, sample_rate)
+        with self._lock:
+            segments, _ = self.model.transcribe(samples, language=self.language, beam_size=1,
+                                                condition_on_previous_text=False)
+            return " ".join(segment.text.strip() for segment in segments).strip()
+
+    def transcribe_partial(self, samples: np.ndarray, sample_rate: int) -> str:
+        return self.transcribe(samples, sample_rate)
+
+
+class StubTranscriptionBackend:
+    accepts_arrays = True
+    supports_partials = True
+
+    def __init__(self, responses: Iterable[str] = ("hello there",)):
+        """
+        Deterministic offline backend: returns the given responses in order,
+        cycling, without looking at the audio. Partial results are prefixes
+        proportional to how much audio has been seen.
+        """
+        self.name = 'stub'
+        self.responses = list(responses) or [""]
+        self.calls = 0
+
+    def transcribe(self, audio, sample_rate: Optional[int] = None) -> str:
+        text = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return text
+
+    def transcribe_partial(self, samples: np.ndarray, sample_rate: int) -> str:
+        # Reveal one word per half second of audio
+        text = self.responses[self.calls % len(self.responses)]
+        words = text.split()
+        return " ".join(words[:max(1, int(len(samples) / (sample_rate * 0.5)))])
+
+
+def create_transcription_backend(backend: str = 'openai', client=None, **options):
+    """
+    Build the speech-to-text backend for this deployment.
+
+    Args:
+        backend: 'openai' (Whisper API), 'local' (faster-whisper on CPU) or 'stub'
+        client: OpenAI client, required for the openai backend
+        **options: Passed to the backend's constructor
+    """
+    backend = (backend or 'openai').lower()
+    if backend == 'openai':
+        if client is None:
+            raise ValueError("The openai transcription backend needs an OpenAI client")
+        return OpenAIWhisperBackend(client, **options)
+    if backend == 'local':
+        return LocalWhisperBackend(**options)
+    if backend == 'stub':
+        return StubTranscriptionBackend(**options)
+    raise ValueError(f"Unknown transcription backend: {backend}. Choose from {', '.join(TRANSCRIPTION_BACKENDS)}")
+
+
+class PartialTranscriber:
+    def __init__(self, backend, get_audio: Callable[[], np.ndarray], sample_rate: int,
+                 on_partial: Callable[[str], None], interval: float = 1.0, min_seconds: float = 0.5):
+        """
+        Periodically transcribe the audio recorded so far while the user is still talking.
+
+        Runs in its own thread and never touches the audio callback: each pass
+        snapshots the recorder's buffer via get_audio() and reports the text
+        through on_partial() when it changes.
+
+        Args:
+            backend: A backend with supports_partials and transcribe_partial()
+            get_audio: Returns the samples recorded so far
+            sample_rate: Samples per second
+            on_partial: Called with each new partial transcript
+            interval: Seconds between passes
+            min_seconds: Skip passes until at least this much audio exists
+        """
+        self.backend = backend
+        self.get_audio = get_audio
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.interval = interval
+        self.min_samples = int(sample_rate * min_seconds)
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_text = ""
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="partial-transcriber", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            samples = self.get_audio()
+            if len(samples) < self.min_samples:
+                continue
+            try:
+                start = time.perf_counter()
+                text = self.backend.transcribe_partial(samples, self.sample_rate)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"Error in partial transcription: {str(e)}")
+                continue
+            if text and text != self.last_text and not self._stop.is_set():
+                self.last_text = text
+                self.on_partial(text)
+            if elapsed > self.interval:
+                # Don't let partials fall further and further behind on slow hosts
+                self._stop.wait(elapsed - self.interval)
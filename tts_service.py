@@ -0,0 +1,225 @@
+#tts_service.py
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TTS_BACKENDS = ('gtts', 'local')
+
+
+class GTTSBackend:
+    def __init__(self, lang: str = 'en', slow: bool = False):
+        """Google Translate TTS over the network; returns MP3 audio."""
+        self.name = 'gtts'
+        self.lang = lang
+        self.voice = 'default'
+        self.slow = slow
+        self.format = 'mp3'
+
+    def synthesize(self, text: str) -> bytes:
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, slow=self.slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class LocalTTSBackend:
+    def __init__(self, voice: Optional[str] = None, rate: Optional[int] = None, lang: str = 'en'):
+        """
+        Offline speech synthesis through the platform's engine (pyttsx3:
+        SAPI5, NSSpeechSynthesizer or eSpeak); returns WAV audio.
+        """
+        try:
+            import pyttsx3
+        except ImportError:
+            raise ImportError("The local TTS backend requires pyttsx3 (pip install pyttsx3)")
+        self.name = 'local'
+        self.lang = lang
+        self.voice = voice or 'default'
+        self.format = 'wav'
+        self.engine = pyttsx3.init()
+        if voice:
+            self.engine.setProperty('voice', voice)
+        if rate:
+            self.engine.setProperty('rate', rate)
+        self._lock = threading.Lock()
+
+    def synthesize(self, text: str) -> bytes:
+        # pyttsx3 can only render to a file
+        fd, path = tempfile.mkstemp(prefix='tts_', suffix='.wav')
+        os.close(fd)
+        try:
+            with self._lock:
+                self.engine.save_to_file(text, path)
+                self.engine.runAndWait()
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+def create_tts_backend(backend: str = 'gtts', **options):
+    """
+    Build the speech synthesis backend.
+
+    Args:
+        backend: 'gtts' (network) or 'local' (pyttsx3, offline)
+        **options: Passed to the backend's constructor
+    """
+    backend = (backend or 'gtts').lower()
+    if backend == 'gtts':
+        return GTTSBackend(**options)
+    if backend == 'local':
+        return LocalTTSBackend(**options)
+    raise ValueError(f"Unknown TTS backend: {backend}. Choose from {', '.join(TTS_BACKENDS)}")
+
+
+class TTSCache:
+    def __init__(self, directory: str = 'tts_cache', max_bytes: int = 50 * 1024 * 1024):
+        """
+        Content-addressed on-disk cache of synthesized audio with LRU size eviction.
+
+        Entries are named by a hash of (backend, voice, lang, text), so identical
+        phrases are synthesized once. Recency is kept in memory and rebuilt from
+        file modification times on startup.
+
+        Args:
+            directory: Where audio files are stored
+            max_bytes: Total size above which least recently used entries are deleted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path) and not name.endswith('.tmp'):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = (os.path.join(self.directory, name), size)
+            self._total_bytes += size
+
+    @staticmethod
+    def make_key(text: str, backend: str, voice: str, lang: str) -> str:
+        return hashlib.sha256(f"{backend}\0{voice}\0{lang}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str, fmt: str) -> Optional[bytes]:
+        name = f"{key}.{fmt}"
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(entry[0], 'rb') as f:
+                data = f.read()
+            os.utime(entry[0])
+        except OSError:
+            with self._lock:
+                self._drop(name)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, fmt: str, data: bytes):
+        name = f"{key}.{fmt}"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._drop(name, delete=False)
+            self._entries[name] = (path, len(data))
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, name: str, delete: bool = True):
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry[1]
+        if delete:
+            try:
+                os.remove(entry[0])
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'evictions': self.evictions
+            }
+
+
+class TextToSpeechService:
+    def __init__(self, backend, cache: Optional[TTSCache] = None):
+        """
+        Speech synthesis through a pluggable backend, with repeated phrases
+        served from the cache instead of being synthesized again.
+        """
+        self.backend = backend
+        self.cache = cache
+
+    def synthesize(self, text: str) -> Tuple[io.BytesIO, str]:
+        """
+        Returns:
+            Tuple of (audio buffer, file suffix such as '.mp3')
+        """
+        backend = self.backend
+        suffix = f".{backend.format}"
+        key = None
+        if self.cache is not None:
+            key = TTSCache.make_key(text, backend.name, backend.voice, backend.lang)
+            data = self.cache.get(key, backend.format)
+            if data is not None:
+                return io.BytesIO(data), suffix
+
+        data = backend.synthesize(text)
+        if self.cache is not None:
+            try:
+                self.cache.put(key, backend.format, data)
+            except OSError as e:
+                print(f"Error caching synthesized speech: {str(e)}")
+        return io.BytesIO(data), suffix
+
+    def warm(self, phrases: Iterable[str]):
+        """Synthesize fixed phrases ahead of time so they play instantly when needed"""
+        for phrase in phrases:
+            try:
+                self.synthesize(phrase)
+            except Exception as e:
+                print(f"Error warming TTS cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'backend': self.backend.name}
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
@@ -0,0 +1,287 @@
+#voice_activity.py
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def frame_features(block: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-frame RMS energy and zero-crossing rate for a block of mono audio,
+    computed in one vectorized pass. A trailing partial frame is dropped.
+    """
+    samples = block.reshape(-1)
+    frames = len(samples) // frame_length
+    if frames == 0:
+        frames, frame_length = 1, len(samples)
+    framed = samples[:frames * frame_length].reshape(frames, frame_length)
+    energy = np.sqrt(np.mean(np.square(framed, dtype=np.float64), axis=1))
+    signs = np.signbit(framed)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frame_length - 1)
+    return energy, zcr
+
+
+def legacy_detect_voice_activity(audio_data: np.ndarray, chunk_size: int, threshold: float = 0.01) -> bool:
+    """The original fixed-threshold detector, kept for benchmark comparisons."""
+    chunks = np.array_split(audio_data, max(1, len(audio_data) // chunk_size))
+    rms_values = [np.sqrt(np.mean(chunk**2)) for chunk in chunks]
+    return max(rms_values) > threshold
+
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate: int, frame_ms: float = 20, min_threshold: float = 0.01,
+                 noise_multiplier: float = 3.0, release_ratio: float = 0.7,
+                 noise_adapt_rate: float = 0.05, onset_frames: int = 2,
+                 hangover_frames: int = 15, use_zcr: bool = True, max_zcr: float = 0.4):
+        """
+        Stateful energy-based voice activity detector for the audio callback.
+
+        Each block is split into frames whose energy (and optionally zero-crossing
+        rate) are computed in one vectorized pass. Speech starts once `onset_frames`
+        consecutive frames exceed the adaptive threshold, and stops only after
+        `hangover_frames` frames below the lower release threshold, so single
+        clicks don't trigger a recording and short pauses don't end one. The noise
+        floor tracks the energy of non-speech frames, so the threshold follows
+        the room instead of a fixed constant.
+
+        Args:
+            sample_rate: Samples per second
+            frame_ms: Analysis frame length
+            min_threshold: Lowest RMS energy ever treated as speech
+            noise_multiplier: Speech threshold as a multiple of the noise floor
+            release_ratio: Release threshold as a fraction of the onset threshold
+            noise_adapt_rate: Smoothing factor for the noise floor estimate
+            onset_frames: Consecutive loud frames required to start speech
+            hangover_frames: Consecutive quiet frames required to end speech
+            use_zcr: Reject loud frames with a noise-like zero-crossing rate
+            max_zcr: Highest zero-crossing rate accepted as speech
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.min_threshold = min_threshold
+        self.noise_multiplier = noise_multiplier
+        self.release_ratio = release_ratio
+        self.noise_adapt_rate = noise_adapt_rate
+        self.onset_frames = onset_frames
+        self.hangover_frames = hangover_frames
+        self.use_zcr = use_zcr
+        self.max_zcr = max_zcr
+        self.noise_floor = min_threshold / noise_multiplier
+        self.reset()
+
+    def reset(self, keep_noise_floor: bool = True):
+        """Return to the non-speech state, optionally forgetting the noise estimate"""
+        self.speaking = False
+        self._loud_run = 0
+        self._quiet_run = 0
+        if not keep_noise_floor:
+            self.noise_floor = self.min_threshold / self.noise_multiplier
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_threshold, self.noise_floor * self.noise_multiplier)
+
+    def process(self, block: np.ndarray) -> bool:
+        """
+        Update the detector with a block of audio.
+
+        Returns:
+            True if the block contains speech (including hangover after speech)
+        """
+        energy, zcr = frame_features(block, self.frame_length)
+        onset = self.threshold
+        release = onset * self.release_ratio
+        voiced = energy > onset
+        if self.use_zcr:
+            voiced &= zcr <= self.max_zcr
+        above_release = energy > release
+
+        detected = False
+        for i in range(len(energy)):
+            if self.speaking:
+                if above_release[i]:
+                    self._quiet_run = 0
+                else:
+                    self._quiet_run += 1
+                    if self._quiet_run > self.hangover_frames:
+                        self.speaking = False
+                        self._loud_run = 0
+            elif voiced[i]:
+                self._loud_run += 1
+                if self._loud_run >= self.onset_frames:
+                    self.speaking = True
+                    self._quiet_run = 0
+            else:
+                self._loud_run = 0
+
+            if self.speaking:
+                detected = True
+            elif not voiced[i]:
+                self.noise_floor += self.noise_adapt_rate * (energy[i] - self.noise_floor)
+        return detected
+
+
+class UtteranceEndpointer:
+    def __init__(self, sample_rate: int, trailing_silence: float = 1.0,
+                 max_utterance: float = 30.0, min_speech: float = 0.25, keep_tail: float = 0.2):
+        """
+        Decide, from inside the audio callback, when an utterance has ended.
+
+        The callback reports each block's VAD decision; once `trailing_silence`
+        seconds pass without speech (or the utterance reaches `max_utterance`),
+        the `done` event is set so the recording thread wakes immediately instead
+        of polling. Timing is measured in samples, not wall-clock time.
+
+        Args:
+            sample_rate: Samples per second
+            trailing_silence: Silence that ends an utterance, in seconds
+            max_utterance: Longest utterance before it is cut, in seconds
+            min_speech: Utterances with less speech than this are discarded
+            keep_tail: Silence kept after the last speech when trimming
+        """
+        self.sample_rate = sample_rate
+        self.trailing_samples = int(sample_rate * trailing_silence)
+        self.max_samples = int(sample_rate * max_utterance)
+        self.min_speech_samples = int(sample_rate * min_speech)
+        self.keep_tail_samples = int(sample_rate * keep_tail)
+        self.done = threading.Event()
+        self.start()
+
+    def start(self):
+        """Begin tracking a new utterance"""
+        self.done.clear()
+        self.reason = None
+        self.total_samples = 0
+        self.speech_samples = 0
+        self.silence_samples = 0
+        self.started_at = time.perf_counter()
+        self.last_speech_at = self.started_at
+        self.ended_at = None
+
+    def update(self, is_speech: bool, frames: int, buffer_full: bool = False) -> Optional[str]:
+        """
+        Account for one block of the current utterance.
+
+        Returns:
+            None while the utterance continues, 'silence' or 'max_length' when it
+            has ended, or 'discard' if it ended with too little speech to keep
+        """
+        self.total_samples += frames
+        if is_speech:
+            self.speech_samples += frames
+            self.silence_samples = 0
+            self.last_speech_at = time.perf_counter()
+        else:
+            self.silence_samples += frames
+
+        if buffer_full or self.total_samples >= self.max_samples:
+            reason = 'max_length'
+        elif self.silence_samples >= self.trailing_samples:
+            reason = 'silence'
+        else:
+            return None
+
+        if self.speech_samples < self.min_speech_samples:
+            self.start()
+            return 'discard'
+        self.reason = reason
+        self.ended_at = time.perf_counter()
+        self.done.set()
+        return reason
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def trim_samples(self) -> int:
+        """Trailing silence (beyond keep_tail) that can be cut before upload"""
+        if self.reason != 'silence':
+            return 0
+        return max(0, self.silence_samples - self.keep_tail_samples)
+
+    def turn_metrics(self, recorded_samples: int) -> Dict[str, Any]:
+        trimmed = min(self.trim_samples(), recorded_samples)
+        return {
+            'reason': self.reason,
+            'utterance_seconds': round((recorded_samples - trimmed) / self.sample_rate, 2),
+            'trimmed_seconds': round(trimmed / self.sample_rate, 2),
+            'endpoint_delay_ms': round((self.ended_at - self.last_speech_at) * 1000, 1) if self.ended_at else None
+        }
+
+
+def _load_labels(wav_path: str) -> Optional[List[Tuple[float, float]]]:
+    """Speech segments from a sidecar <file>.json ([[start, end], ...] in seconds), if present"""
+    import json
+    import os
+
+    label_path = os.path.splitext(wav_path)[0] + '.json'
+    if not os.path.exists(label_path):
+        return None
+    with open(label_path, 'r', encoding='utf-8') as f:
+        return [tuple(segment) for segment in json.load(f)]
+
+
+def _score(decisions: List[bool], block_seconds: float, labels) -> Dict[str, float]:
+    truth = []
+    for i in range(len(decisions)):
+        middle = (i + 0.5) * block_seconds
+        truth.append(any(start <= middle < end for start, end in labels))
+    tp = sum(1 for d, t in zip(decisions, truth) if d and t)
+    fp = sum(1 for d, t in zip(decisions, truth) if d and not t)
+    fn = sum(1 for d, t in zip(decisions, truth) if not d and t)
+    return {
+        'precision': round(tp / (tp + fp), 3) if tp + fp else 1.0,
+        'recall': round(tp / (tp + fn), 3) if tp + fn else 1.0,
+        'false_positive_blocks': fp
+    }
+
+
+def evaluate_wav(wav_path: str, block_ms: float = 100, **vad_params) -> Dict[str, Any]:
+    """
+    Run the legacy detector and VoiceActivityDetector over a WAV file block by block,
+    as the audio callback would, and compare triggers, per-block cost and (if a
+    sidecar label file exists) block-level precision/recall.
+    """
+    import soundfile as sf
+
+    audio, sample_rate = sf.read(wav_path, dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1, keepdims=True)
+    block_size = int(sample_rate * block_ms / 1000)
+    blocks = [audio[i:i + block_size] for i in range(0, len(audio) - block_size + 1, block_size)]
+    labels = _load_labels(wav_path)
+
+    detectors = {
+        'legacy': lambda block: legacy_detect_voice_activity(block, block_size),
+        'vad': VoiceActivityDetector(sample_rate, **vad_params).process
+    }
+    results = {'file': wav_path, 'seconds': round(len(audio) / sample_rate, 2)}
+    for name, detect in detectors.items():
+        decisions = []
+        start = time.perf_counter()
+        for block in blocks:
+            decisions.append(bool(detect(block)))
+        elapsed = time.perf_counter() - start
+        onsets = sum(1 for i, d in enumerate(decisions) if d and (i == 0 or not decisions[i - 1]))
+        summary = {
+            'triggers': onsets,
+            'speech_seconds': round(sum(decisions) * block_ms / 1000, 2),
+            'us_per_block': round(elapsed / max(1, len(blocks)) * 1e6, 1)
+        }
+        if labels is not None:
+            summary.update(_score(decisions, block_ms / 1000, labels))
+        results[name] = summary
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark voice activity detection on WAV fixtures")
+    parser.add_argument('wav_files', nargs='+')
+    parser.add_argument('--block-ms', type=float, default=100)
+    parser.add_argument('--no-zcr', action='store_true')
+    args = parser.parse_args()
+
+    for path in args.wav_files:
+        print(json.dumps(evaluate_wav(path, args.block_ms, use_zcr=not args.no_zcr), indent=2))
@@ -1,26 +1,100 @@
 #weather_service.py
 import os
-import requests
+import re
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from cache_utils import MISSING, SQLiteCache, TTLCache
+from http_client import get_shared_client
+
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org')
+GEOCODE_CACHE_PATH = os.getenv('GEOCODE_CACHE_PATH', os.path.join('cache', 'weather.sqlite3'))
+CURRENT_WEATHER_TTL = 10 * 60
+FORECAST_TTL = 60 * 60
+# The free forecast endpoint covers five days ahead
+MAX_FORECAST_DAYS = 5
+WEATHER_MAX_WORKERS = 8
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+NUMBER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'a couple of': 2, 'couple of': 2, 'few': 3}
+_NUMBER = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+# Words that never belong to a city name
+QUERY_STOPWORDS = {
+    'weather', 'temperature', 'temperatures', 'forecast', 'forecasts', 'what', "what's", 'whats', 'is', 'the',
+    'how', 'tell', 'me', 'give', 'show', 'will', 'it', 'be', 'like', 'going', 'to', 'please', 'can', 'you',
+    'in', 'at', 'for', 'of', 'and', 'a', 'there', 'get', 'check', 'hot', 'cold', 'warm', 'outside', 'current',
+    'today', 'tomorrow', 'now', 'tonight', 'currently', 'weekly', 'week', 'days', 'day', 'next', 'this', 'on'
+}
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, http_client=None, base_url=OPENWEATHER_BASE_URL, geocode_cache_path=GEOCODE_CACHE_PATH,
+                 current_ttl=CURRENT_WEATHER_TTL, forecast_ttl=FORECAST_TTL):
+        """
+        Args:
+            http_client: HttpClient to send requests through (defaults to the shared pooled client)
+            base_url: OpenWeather API root, overridable to point at a local stub server
+            geocode_cache_path: SQLite file for city coordinates (None keeps them in memory only,
+                as does a file that can't be opened, e.g. on a read-only filesystem)
+            current_ttl: Seconds current conditions are reused for a location
+            forecast_ttl: Seconds a 5-day forecast payload is reused for a location
+        """
         self.api_key = os.getenv('WEATHER_API_KEY')
         if not self.api_key:
             raise ValueError("OpenWeather API key not found in environment variables")
+        self.http = http_client or get_shared_client()
+        self.base_url = base_url.rstrip('/')
+        # Coordinates don't change, so geocoding results are kept indefinitely
+        self.geocode_cache = None
+        if geocode_cache_path:
+            try:
+                self.geocode_cache = SQLiteCache(geocode_cache_path, table='geocode')
+            except (OSError, sqlite3.Error) as e:
+                print(f"Geocoding cache at {geocode_cache_path} unavailable, caching in memory only: {str(e)}")
+        if self.geocode_cache is None:
+            self.geocode_cache = TTLCache(maxsize=1024)
+        self.current_cache = TTLCache(maxsize=256, ttl=current_ttl)
+        self.forecast_cache = TTLCache(maxsize=256, ttl=forecast_ttl)
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=WEATHER_MAX_WORKERS, thread_name_prefix='weather')
+        return self._executor
+
+    def geocode(self, city):
+        """
+        Look up a city's coordinates, from the cache when possible.
+
+        Returns:
+            (lat, lon) tuple, or None if the city wasn't found
+        """
+        key = ' '.join(city.lower().split())
+        cached = self.geocode_cache.get(key)
+        if cached is not MISSING:
+            return tuple(cached)
+
+        geo_data = self.http.get_json(
+            f"{self.base_url}/geo/1.0/direct",
+            params={'q': city, 'limit': 1, 'appid': self.api_key},
+            name='openweather.geocode'
+        )
+        if not geo_data:
+            return None
+        coordinates = [geo_data[0]['lat'], geo_data[0]['lon']]
+        self.geocode_cache.set(key, coordinates)
+        return tuple(coordinates)
 
     def get_weather(self, city, forecast_days=0):
         """Get current weather or forecast for a specific city"""
         try:
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={self.api_key}"
-            geo_response = requests.get(geo_url)
-            geo_data = geo_response.json()
+            coordinates = self.geocode(city)
             
-            if not geo_data:
+            if not coordinates:
                 return f"Could not find location: {city}"
                 
-            lat = geo_data[0]['lat']
-            lon = geo_data[0]['lon']
+            lat, lon = coordinates
             
             if forecast_days == 0:
                 return self._get_current_weather(lat, lon)
@@ -30,11 +104,23 @@ class WeatherService:
         except Exception as e:
             return f"Error getting weather data: {str(e)}"
 
+    def _fetch_current(self, lat, lon):
+        return self.current_cache.get_or_set((round(lat, 3), round(lon, 3)), lambda: self.http.get_json(
+            f"{self.base_url}/data/2.5/weather",
+            params={'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'},
+            name='openweather.current'
+        ))
+
+    def _fetch_forecast(self, lat, lon):
+        return self.forecast_cache.get_or_set((round(lat, 3), round(lon, 3)), lambda: self.http.get_json(
+            f"{self.base_url}/data/2.5/forecast",
+            params={'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'},
+            name='openweather.forecast'
+        ))
+
     def _get_current_weather(self, lat, lon):
         """Get current weather for given coordinates"""
-        weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
-        response = requests.get(weather_url)
-        data = response.json()
+        data = self._fetch_current(lat, lon)
         
         return {
             'temperature': data['main']['temp'],
@@ -45,48 +131,151 @@ class WeatherService:
 
     def _get_forecast(self, lat, lon, forecast_days):
         """Get weather forecast for given coordinates and days ahead"""
-        forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
-        response = requests.get(forecast_url)
-        data = response.json()
-        
-        target_date = datetime.now() + timedelta(days=forecast_days)
-        target_forecasts = [item for item in data['list'] 
-                          if datetime.fromtimestamp(item['dt']).date() == target_date.date()]
-        
-        if not target_forecasts:
-            return f"No forecast available for {forecast_days} days ahead"
-            
-        avg_temp = sum(item['main']['temp'] for item in target_forecasts) / len(target_forecasts)
-        weather_desc = target_forecasts[0]['weather'][0]['description']
-        
-        return {
-            'temperature': avg_temp,
-            'description': weather_desc,
-            'date': target_date.strftime('%Y-%m-%d')
-        }
+        return self.summarize_forecast(self._fetch_forecast(lat, lon), [forecast_days])[forecast_days]
+
+    def summarize_forecast(self, data, days):
+        """
+        Daily summaries for several days from one forecast payload.
+
+        The 3-hourly entries are grouped by date in a single pass, then each
+        requested day gets its average, low and high temperature and most common description.
+
+        Returns:
+            Dict of days ahead -> summary dict, or an error string if that day isn't covered
+        """
+        by_date = {}
+        for item in data['list']:
+            by_date.setdefault(datetime.fromtimestamp(item['dt']).date(), []).append(item)
+
+        summaries = {}
+        for forecast_days in days:
+            target_date = datetime.now() + timedelta(days=forecast_days)
+            target_forecasts = by_date.get(target_date.date())
+            if not target_forecasts:
+                summaries[forecast_days] = f"No forecast available for {forecast_days} days ahead"
+                continue
+            temperatures = [item['main']['temp'] for item in target_forecasts]
+            descriptions = Counter(item['weather'][0]['description'] for item in target_forecasts)
+            summaries[forecast_days] = {
+                'temperature': round(sum(temperatures) / len(temperatures), 1),
+                'min_temperature': min(temperatures),
+                'max_temperature': max(temperatures),
+                'description': descriptions.most_common(1)[0][0],
+                'date': target_date.strftime('%Y-%m-%d')
+            }
+        return summaries
+
+    def get_weather_report(self, cities, days=(0,)):
+        """
+        Weather for several cities and days, with the network calls issued concurrently.
+
+        All cities are geocoded in parallel, then every current-weather and
+        forecast request is fetched in parallel; each city's forecast is
+        downloaded once (or taken from the cache) and answers all requested days.
+
+        Args:
+            cities: City names
+            days: Days ahead; 0 is current conditions
+
+        Returns:
+            List of {'city', 'days', 'data'} entries in the order requested, where
+            data maps each day to a weather dict or an error message
+        """
+        days = sorted(set(days)) or [0]
+        forecast_days = [day for day in days if day > 0]
+        report = [{'city': city, 'days': days, 'data': {}} for city in cities]
+
+        locations = list(self.executor.map(self._safe_geocode, cities))
+        futures = []
+        for entry, location in zip(report, locations):
+            if isinstance(location, str):
+                entry['data'] = {day: location for day in days}
+                continue
+            lat, lon = location
+            if 0 in days:
+                futures.append((entry, 'current', self.executor.submit(self._get_current_weather, lat, lon)))
+            if forecast_days:
+                futures.append((entry, 'forecast', self.executor.submit(self._fetch_forecast, lat, lon)))
+
+        for entry, kind, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = f"Error getting weather data: {str(e)}"
+                entry['data'].update({day: error for day in ([0] if kind == 'current' else forecast_days)})
+                continue
+            if kind == 'current':
+                entry['data'][0] = result
+            else:
+                entry['data'].update(self.summarize_forecast(result, forecast_days))
+        return report
+
+    def _safe_geocode(self, city):
+        """Coordinates, or an error message for the report"""
+        try:
+            coordinates = self.geocode(city)
+        except Exception as e:
+            return f"Error getting weather data: {str(e)}"
+        return coordinates or f"Could not find location: {city}"
+
+    def parse_weather_request(self, text):
+        """
+        Parse a weather question into the cities and days it asks about, e.g.
+        "weather in Paris and Berlin this week" -> (['paris', 'berlin'], [0, 1, 2, 3, 4]).
+
+        Returns:
+            Tuple of (list of city names, sorted list of days ahead)
+        """
+        text = text.lower()
+        days = set()
+
+        def number(value):
+            return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+        def take(pattern, to_days):
+            nonlocal text
+            for match in re.finditer(pattern, text):
+                days.update(to_days(match))
+            text = re.sub(pattern, ' ', text)
+
+        today = datetime.now().weekday()
+        take(r'\b(?:the )?day after(?: tomorrow)?\b', lambda m: [2])
+        take(r'\b(?:tomorrow|next day)\b', lambda m: [1])
+        take(r'\b(?:over )?(?:the )?next ' + _NUMBER + r' days\b', lambda m: range(1, number(m.group(1)) + 1))
+        take(r'\bin ' + _NUMBER + r' days\b', lambda m: [number(m.group(1))])
+        take(r'\b(?:this |the |next )?weekend\b', lambda m: [(5 - today) % 7, (6 - today) % 7])
+        take(r'\b(?:this |the |next )?week\b|\bweekly\b', lambda m: range(0, MAX_FORECAST_DAYS))
+        take(r'\b(?:on )?(' + '|'.join(WEEKDAYS) + r')\b', lambda m: [(WEEKDAYS.index(m.group(1)) - today) % 7])
+        take(r'\b(?:today|tonight|right now|now|currently)\b', lambda m: [0])
+        days = sorted(day for day in days if day <= MAX_FORECAST_DAYS) or [0]
+
+        text = re.sub(r"[^\w\s,'&-]", ' ', text)
+        match = re.search(r'\b(?:in|for|at)\s+(.+)$', text)
+        places = match.group(1) if match else text
+        cities = []
+        for part in re.split(r'\s*(?:,|&|\band\b)\s*', places):
+            words = [word for word in part.split() if word not in QUERY_STOPWORDS]
+            if words:
+                city = ' '.join(words)
+                if city not in cities:
+                    cities.append(city)
+        return cities, days
 
     def parse_weather_query(self, text):
         """Parse the weather query to extract city and time"""
-        text = text.lower()
-        
-        tomorrow_indicators = ['tomorrow', 'next day']
-        future_indicators = ['day after', 'next week', 'in \d+ days']
-        
-        words = text.split()
-        city = None
-        forecast_days = 0
-        
-        if any(indicator in text for indicator in tomorrow_indicators):
-            forecast_days = 1
-        elif 'day after' in text:
-            forecast_days = 2
-        
-        for word in words:
-            if word not in ['weather', 'temperature', 'forecast', 'in', 'at', 'tomorrow', 'today']:
-                city = word
-                break
-        
-        return city, forecast_days
+        cities, days = self.parse_weather_request(text)
+        return (cities[0] if cities else None), days[0]
+
+    def format_weather_report(self, report):
+        """Format a multi-city, multi-day report into one reply"""
+        lines = []
+        for entry in report:
+            for day in entry['days']:
+                line = self.format_weather_response(entry['data'].get(day), entry['city'], day)
+                # A failed lookup reports the same message for every day
+                if line and line not in lines:
+                    lines.append(line)
+        return '\n'.join(lines)
 
     def format_weather_response(self, weather_data, city, forecast_days=0):
         """Format weather data into a readable response"""
@@ -97,5 +286,15 @@ class WeatherService:
             else:
                 response = f"Weather forecast for {city.title()} on {weather_data['date']}: "
                 response += f"{weather_data['temperature']}°C, {weather_data['description']}"
+                if 'min_temperature' in weather_data:
+                    response += f" (low {weather_data['min_temperature']}°C, high {weather_data['max_temperature']}°C)"
             return response
-        return weather_data 
\ No newline at end of file
+        return weather_data
+
+    def cache_stats(self):
+        """Hit rates of the geocoding, current weather and forecast caches"""
+        return {
+            'geocode': self.geocode_cache.stats(),
+            'current': self.current_cache.stats(),
+            'forecast': self.forecast_cache.stats()
+        }